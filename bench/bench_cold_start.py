@@ -0,0 +1,68 @@
+"""Benchmark: isolate cold start, with the sync engine imported eagerly vs on first use.
+
+Run from the repository root:
+
+    python bench/bench_cold_start.py [samples]
+
+Every sample is a fresh interpreter, standing in for a new isolate. `eager` imports `sync` next to
+`index` at startup, as the single-module layout did; `lazy` is the shipped layout, where the first
+`/api/sync` or cron trigger imports it. Reports the median module import time, modules loaded, the
+first `GET /` and the first sync trigger (including the deferred import) against the local mocks.
+"""
+import json, os, statistics, subprocess, sys, time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def sample(mode):
+    """Runs in the child interpreter; prints one JSON line of timings."""
+    sys.path[:0] = [HERE, os.path.join(HERE, "..", "src")]
+    from types import SimpleNamespace
+    import fakes
+    fakes.install()
+    baseline = len(sys.modules)
+
+    started = time.perf_counter()
+    import index
+    if mode == "eager":
+        import sync
+    import_ms = (time.perf_counter() - started) * 1000
+    modules = len(sys.modules) - baseline
+
+    from fakes import FakeRequest, read_body
+    from mock_hw import MockHuaweiDns
+    from mock_wetest import MockWetest
+    fakes.route("www.wetest.vip", MockWetest())
+    fakes.route("dns.cn-east-3.myhuaweicloud.com", MockHuaweiDns("zone-0001"))
+    env = SimpleNamespace(DOMAIN_NAME="cdn.example.com", HW_ZONE_ID="zone-0001", HW_AK="ak", HW_SK="sk", LOG_LEVEL="FATAL")
+    worker = index.Default(ctx=None, env=env)
+
+    async def first_requests():
+        started = time.perf_counter()
+        await read_body(await worker.fetch(FakeRequest("https://cdn.example.com/")))
+        page_ms = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        await worker.scheduled(None, env, None)
+        return page_ms, (time.perf_counter() - started) * 1000
+
+    page_ms, sync_ms = fakes.run(first_requests())
+    print(json.dumps({"import_ms": import_ms, "modules": modules, "page_ms": page_ms, "sync_ms": sync_ms}))
+
+def collect(mode, samples):
+    rows = []
+    for _ in range(samples):
+        out = subprocess.run([sys.executable, __file__, "--sample", mode], capture_output=True, text=True, check=True).stdout
+        rows.append(json.loads(out.strip().splitlines()[-1]))
+    return {key: statistics.median(row[key] for row in rows) for key in rows[0]}
+
+def main():
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else 15
+    print(f"{'layout':<10}{'import ms':>12}{'modules':>10}{'first / ms':>12}{'first sync ms':>15}")
+    for mode in ("eager", "lazy"):
+        result = collect(mode, samples)
+        print(f"{mode:<10}{result['import_ms']:>12.2f}{result['modules']:>10.0f}{result['page_ms']:>12.2f}{result['sync_ms']:>15.2f}")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--sample":
+        sample(sys.argv[2])
+    else:
+        main()
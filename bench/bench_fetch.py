@@ -0,0 +1,67 @@
+"""Benchmark: `Default.fetch` request throughput for the page, diagnostics and asset routes.
+
+Run from the repository root:
+
+    python bench/bench_fetch.py [iterations]
+
+Each route is requested through the full `fetch` entry point with the fake runtime, including
+draining streamed bodies. Reports requests/sec, response bytes and the peak bytes allocated by a
+single request (tracemalloc).
+"""
+import asyncio, json, sys, time, tracemalloc
+
+from harness import make_worker
+import fakes
+from fakes import FakeRequest, FakeResponse, read_body
+from page import APP_CSS_ASSET
+
+HEADERS = {"cf-connecting-ip": "203.0.113.7", "cf-ray": "8f1e2d3c4b5a6978-HKG", "cf-ipcountry": "HK"}
+CF = {"colo": "HKG", "country": "HK", "region": "Central and Western", "city": "Hong Kong", "httpProtocol": "HTTP/2", "tlsVersion": "TLSv1.3"}
+MUSIC_URL = "https://files.rpnet.cc/cdn.rpnet.cc/data/music.json"
+TRACKS = [{"title": f"Track {n}", "artist": "Artist", "audio": f"https://files.rpnet.cc/music/{n}.mp3", "cover": f"https://files.rpnet.cc/covers/{n}.jpg"} for n in range(40)]
+
+async def music_host(method, url, headers, body):
+    return FakeResponse(json.dumps(TRACKS), 200, {"ETag": '"bench"'})
+
+CASES = (
+    ("GET /", "https://cdn.rpnet.cc/", {}),
+    ("GET /sync", "https://cdn.rpnet.cc/sync?token=t", {}),
+    ("GET /api/info", "https://cdn.rpnet.cc/api/info", {}),
+    ("GET /api/info (304)", "https://cdn.rpnet.cc/api/info", "etag"),
+    ("GET /api/playlist", "https://cdn.rpnet.cc/api/playlist", {}),
+    ("GET asset", f"https://cdn.rpnet.cc{APP_CSS_ASSET.path}", {}),
+    ("GET asset (304)", f"https://cdn.rpnet.cc{APP_CSS_ASSET.path}", {"if-none-match": APP_CSS_ASSET.etag}),
+)
+
+async def request(worker, url, extra):
+    response = await worker.fetch(FakeRequest(url, headers={**HEADERS, **extra}, cf=CF))
+    return response.status, await read_body(response)
+
+async def bench(iterations):
+    fakes.route("files.rpnet.cc", music_host)
+    worker = make_worker(MUSIC_JSON_URL=MUSIC_URL)
+    await worker.fetch(FakeRequest("https://cdn.rpnet.cc/api/playlist")) # warm the playlist copy
+    info_etag = (await worker.fetch(FakeRequest(CASES[2][1], headers=HEADERS, cf=CF))).headers.get("etag")
+
+    print(f"{'case':<24}{'status':>8}{'req/s':>12}{'resp bytes':>12}{'peak bytes':>12}")
+    for label, url, extra in CASES:
+        extra = {"if-none-match": info_etag} if extra == "etag" else extra
+        status, body = await request(worker, url, extra)
+
+        started = time.perf_counter()
+        for _ in range(iterations):
+            await request(worker, url, extra)
+        rate = iterations / (time.perf_counter() - started)
+
+        tracemalloc.start()
+        await request(worker, url, extra)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{label:<24}{status:>8}{rate:>12,.0f}{len(body):>12,}{peak:>12,}")
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    asyncio.run(bench(iterations))
+
+if __name__ == "__main__":
+    main()
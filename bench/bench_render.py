@@ -0,0 +1,118 @@
+"""Micro-benchmark: landing page rendering, the original worker's chained str.replace vs. precompiled segments.
+
+Run from the repository root (the baseline template is read from git):
+
+    python bench/bench_render.py [iterations]
+
+The legacy side is the template and replace chain of the pre-optimization worker (BASELINE_COMMIT),
+with every slot it filled. The compiled side clears the cached <head> before every render, so it
+times a full render; "head cached" is the steady state of a warm isolate. Before timing, both
+pages are checked to carry the same visible text and markup apart from the expected differences.
+Reports per-render wall/CPU time, the peak bytes allocated by a single render (tracemalloc) and
+the size of the HTML document sent per request.
+"""
+import ast, os, subprocess, sys, time, tracemalloc
+from html.parser import HTMLParser
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from page import APP_CSS_ASSET, APP_JS_ASSET, render_page, render_page_head, render_sync_script
+
+BASELINE_COMMIT = "ce924a5"
+FIELDS = ("cdn.rpnet.cc", "203.0.113.7", "8f1e2d3c4b5a6978-HKG", "HKG", "Central and Western, Hong Kong, HK", "HTTP/2", "TLSv1.3")
+MUSIC_URL = "https://files.rpnet.cc/cdn.rpnet.cc/data/music.json"
+TOKEN = "benchmark-token"
+
+def load_baseline():
+    """The page template and the /sync script f-string from the baseline worker's fetch handler."""
+    source = subprocess.run(["git", "-C", ROOT, "show", f"{BASELINE_COMMIT}:src/index.py"], capture_output=True, text=True, check=True).stdout
+    found = {}
+    for node in ast.walk(ast.parse(source)):
+        if isinstance(node, ast.Assign) and isinstance(node.targets[0], ast.Name) and node.targets[0].id in ("tpl", "sync_script"):
+            found[node.targets[0].id] = node.value
+    sync_script = eval(compile(ast.Expression(found["sync_script"]), "baseline", "eval"), {"token_to_pass": TOKEN})
+    return found["tpl"].value, sync_script
+
+LEGACY_TEMPLATE, LEGACY_SYNC_SCRIPT = load_baseline()
+
+def legacy_render(sync_script=""):
+    hst, cip, rid, clo, loc_str, prt, tls = FIELDS
+    r = LEGACY_TEMPLATE.replace("${currentHost}", hst) \
+           .replace("${currentHost.toUpperCase()}", hst.upper()) \
+           .replace("${clientIp}", cip) \
+           .replace("${rayId}", rid) \
+           .replace("${colo}", clo) \
+           .replace("${location}", loc_str) \
+           .replace("${httpProtocol}", prt) \
+           .replace("${tlsVersion}", tls) \
+           .replace("${musicJsonUrl}", MUSIC_URL) \
+           .replace("${playerVisibilityClass}", "")
+    if sync_script:
+        r = r.replace("</body>", f"{sync_script}</body>")
+    return r
+
+def compiled_render(sync_script=""):
+    render_page_head.cache_clear()
+    return render_page(*FIELDS, MUSIC_URL, sync_script)
+
+def cached_head_render(sync_script=""):
+    return render_page(*FIELDS, MUSIC_URL, sync_script)
+
+class PageOutline(HTMLParser):
+    """Visible text and the tag/attribute sequence of a page, ignoring data-* attributes."""
+    def __init__(self, page):
+        super().__init__()
+        self.text, self.tags, self.raw = [], [], 0
+        self.feed(page)
+
+    def handle_starttag(self, tag, attrs):
+        self.raw += tag in ("script", "style")
+        self.tags.append((tag, tuple(sorted((k, v) for k, v in attrs if not k.startswith("data-")))))
+
+    def handle_endtag(self, tag):
+        self.raw -= tag in ("script", "style")
+
+    def handle_data(self, data):
+        if not self.raw and data.strip():
+            self.text.append(" ".join(data.split()))
+
+def check_equivalent():
+    """Same text and markup, except: resource hints added, and CSS/JS inlined vs. served as assets."""
+    legacy, compiled = PageOutline(legacy_render()), PageOutline(cached_head_render())
+    assert legacy.text == compiled.text, "visible text differs"
+    expected = {("style", ()): ("link", (("href", APP_CSS_ASSET.path), ("rel", "stylesheet"))), ("script", ()): ("script", (("src", APP_JS_ASSET.path),))}
+    hints = [tag for tag in compiled.tags if tag[0] == "link" and dict(tag[1]).get("rel") in ("preconnect", "preload")]
+    assert len(hints) == 5, hints
+    assert [expected.get(tag, tag) for tag in legacy.tags] == [tag for tag in compiled.tags if tag not in hints], "markup differs"
+
+def measure(fn, iterations, *args):
+    fn(*args)
+    wall, cpu = time.perf_counter(), time.process_time()
+    for _ in range(iterations):
+        fn(*args)
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+
+    tracemalloc.start()
+    fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return wall / iterations * 1e6, cpu / iterations * 1e6, peak, len(fn(*args).encode("utf-8"))
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    check_equivalent()
+    sync_script = render_sync_script(TOKEN)
+    print(f"{'case':<26}{'wall us/req':>14}{'cpu us/req':>14}{'peak bytes':>14}{'html bytes':>14}")
+    for label, fn, args in (
+        ("legacy /", legacy_render, ()),
+        ("compiled /", compiled_render, ()),
+        ("compiled / head cached", cached_head_render, ()),
+        ("legacy /sync", legacy_render, (LEGACY_SYNC_SCRIPT,)),
+        ("compiled /sync", compiled_render, (sync_script,)),
+    ):
+        wall, cpu, peak, size = measure(fn, iterations, *args)
+        print(f"{label:<26}{wall:>14.2f}{cpu:>14.2f}{peak:>14,}{size:>14,}")
+
+if __name__ == "__main__":
+    main()
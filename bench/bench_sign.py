@@ -0,0 +1,86 @@
+"""Benchmark: HW request signing, per-call `hw_sign` vs. the cached HuaweiDnsClient context.
+
+Run from the repository root:
+
+    python bench/bench_sign.py [iterations]
+
+Both paths are checked to produce the same Authorization header before timing.
+"""
+import hashlib, hmac, os, sys, time
+from datetime import datetime, timezone
+from urllib.parse import quote
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [HERE, os.path.join(HERE, "..", "src")]
+
+import fakes
+fakes.install()
+
+import js
+from hwdns import HuaweiDnsClient
+
+AK, SK, REGION, ZONE = "AKEXAMPLE0000000", "SKEXAMPLE" * 4, "cn-east-3", "ff8080829a978801019c84616c8c626f"
+HOST = f"dns.{REGION}.myhuaweicloud.com"
+BODY = '{"name": "cdn.rpnet.cc.", "type": "A", "records": ["104.16.1.1", "104.16.1.2", "104.16.1.3"], "ttl": 600}'
+LIST_QUERY = "name=cdn.rpnet.cc.&search_mode=equal&limit=100&offset=0"
+
+def legacy_hw_sign(method, url, body, host, sdk_date=None):
+    """The previous `Default.hw_sign`, with credentials passed in and an optional fixed date."""
+    ak, sk = AK, SK
+    path_query = url.split(host)[1]
+    uri = path_query.split('?')[0]
+    if not uri.endswith('/'): uri += '/'
+    query_str = path_query.split('?')[1] if '?' in path_query else ""
+    canonical_qs = ""
+    if query_str:
+        q_pairs = [f"{quote(k, safe='~')}={quote(v, safe='~')}" for param in query_str.split('&') for k, v in [param.split('=', 1) if '=' in param else (param, "")]]
+        q_pairs.sort()
+        canonical_qs = '&'.join(q_pairs)
+    t = datetime.now(timezone.utc)
+    sdk_date = sdk_date or t.strftime('%Y%m%dT%H%M%SZ')
+    hashed_payload = hashlib.sha256(body.encode('utf-8') if body else b"").hexdigest()
+    canonical_headers = f"content-type:application/json\nhost:{host}\nx-sdk-date:{sdk_date}\n"
+    signed_headers = "content-type;host;x-sdk-date"
+    canonical_request = f"{method}\n{uri}\n{canonical_qs}\n{canonical_headers}\n{signed_headers}\n{hashed_payload}"
+    hashed_req = hashlib.sha256(canonical_request.encode('utf-8')).hexdigest()
+    string_to_sign = f"SDK-HMAC-SHA256\n{sdk_date}\n{hashed_req}"
+    signature = hmac.new(sk.encode('utf-8'), string_to_sign.encode('utf-8'), hashlib.sha256).hexdigest()
+    h = js.Headers.new()
+    h.append("Content-Type", "application/json")
+    h.append("X-Sdk-Date", sdk_date)
+    h.append("Host", host)
+    h.append("Authorization", f"SDK-HMAC-SHA256 Access={ak}, SignedHeaders={signed_headers}, Signature={signature}")
+    return h
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    client = HuaweiDnsClient(AK, SK, REGION, ZONE)
+    path = client.recordsets_path
+    date = "20260101T000000Z"
+
+    cases = (
+        ("GET list", "GET", path, LIST_QUERY, ""),
+        ("PUT update", "PUT", f"{path}/rs0001", "", BODY),
+    )
+    for _, method, p, query, body in cases:
+        url = f"https://{HOST}{p}" + (f"?{query}" if query else "")
+        expected = legacy_hw_sign(method, url, body, HOST, date).get("Authorization")
+        actual = client.sign(method, p, query, body.encode("utf-8"), date)["Authorization"]
+        assert expected == actual, f"signature mismatch for {method} {p}"
+
+    print(f"{'case':<14}{'legacy signs/s':>16}{'client signs/s':>16}{'speedup':>10}")
+    for label, method, p, query, body in cases:
+        url = f"https://{HOST}{p}" + (f"?{query}" if query else "")
+        started = time.perf_counter()
+        for _ in range(iterations):
+            legacy_hw_sign(method, url, body, HOST)
+        legacy = iterations / (time.perf_counter() - started)
+
+        started = time.perf_counter()
+        for _ in range(iterations):
+            client.request_init(method, p, query, body)
+        cached = iterations / (time.perf_counter() - started)
+        print(f"{label:<14}{legacy:>16,.0f}{cached:>16,.0f}{cached / legacy:>9.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Benchmark: end-to-end `perform_full_sync` against the mock upstream and mock HW DNS API.
+
+Run from the repository root:
+
+    python bench/bench_sync.py [--iterations N] [--wetest-latency-ms MS] [--hw-latency-ms MS] [--error-rate P]
+
+Every scenario runs N times on fresh mocks and reports the median and p95 wall time of one run and
+the mean outbound calls per run, split into upstream fetches, HW reads and HW writes. Latency and error
+rates apply to both mocks; `flaky upstream` always injects upstream failures to exercise retries.
+"""
+import argparse, statistics, time
+
+from harness import REGION_HOST, WETEST_HOST, ZONE_ID, make_engine, reset_isolate, seed_stale
+import fakes
+from mock_hw import MockHuaweiDns
+from mock_wetest import MockWetest
+
+def count_calls():
+    upstream = len(fakes.calls(hostname=WETEST_HOST))
+    reads = len(fakes.calls("GET", hostname=REGION_HOST))
+    writes = len(fakes.calls(hostname=REGION_HOST)) - reads
+    return upstream, reads, writes
+
+def run_scenario(args, name, seed, force=True, warm=False, upstream_errors=None):
+    timings, totals = [], [0, 0, 0]
+    for i in range(args.iterations):
+        hw = MockHuaweiDns(ZONE_ID, latency_ms=args.hw_latency_ms, error_rate=args.error_rate, seed=i)
+        wetest = MockWetest(latency_ms=args.wetest_latency_ms, error_rate=args.error_rate if upstream_errors is None else upstream_errors, seed=i)
+        seed(hw)
+        reset_isolate(wetest, hw)
+        engine = make_engine(LOG_LEVEL="FATAL", UPSTREAM_RETRIES="3")
+        if warm:
+            fakes.run(engine.perform_full_sync(force=True))
+            fakes.CALLS.clear()
+
+        started = time.perf_counter()
+        fakes.run(engine.perform_full_sync(force=force))
+        timings.append((time.perf_counter() - started) * 1000)
+        totals = [t + c for t, c in zip(totals, count_calls())]
+
+    timings.sort()
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    upstream, reads, writes = (t / args.iterations for t in totals)
+    print(f"{name:<34}{statistics.median(timings):>10.2f}{p95:>10.2f}{upstream:>10.1f}{reads:>10.1f}{writes:>10.1f}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--wetest-latency-ms", type=float, default=0)
+    parser.add_argument("--hw-latency-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    print(f"{'scenario':<34}{'p50 ms':>10}{'p95 ms':>10}{'upstream':>10}{'hw reads':>10}{'hw writes':>10}")
+    run_scenario(args, "empty zone -> creates", lambda hw: None)
+    run_scenario(args, "stale lines -> batch update", seed_stale)
+    run_scenario(args, "in sync, forced (remote match)", lambda hw: None, warm=True)
+    run_scenario(args, "in sync (fingerprint skip)", lambda hw: None, force=False, warm=True)
+    run_scenario(args, "flaky upstream (30% errors)", seed_stale, upstream_errors=max(args.error_rate, 0.3))
+
+if __name__ == "__main__":
+    main()
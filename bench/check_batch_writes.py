@@ -0,0 +1,62 @@
+"""Call-count checks for batched HW DNS writes, against the local mock API.
+
+Run from the repository root:
+
+    python bench/check_batch_writes.py
+
+Each scenario runs a full forced sync and asserts how many signed write calls reached the mock.
+"""
+from harness import HOSTNAME, REGION_HOST, ZONE_ID, make_engine, reset_isolate, seed_stale
+import fakes
+from mock_hw import MockHuaweiDns
+from mock_wetest import MockWetest
+
+wetest = MockWetest()
+
+def run_scenario(name, hw, expect, **env):
+    reset_isolate(wetest, hw)
+    fakes.run(make_engine(**env).perform_full_sync(force=True))
+
+    path = f"/v2.1/zones/{ZONE_ID}/recordsets"
+    counts = {
+        "batch_put": sum(1 for c in fakes.calls("PUT", hostname=REGION_HOST) if c["url"].endswith(path)),
+        "batch_delete": sum(1 for c in fakes.calls("DELETE", hostname=REGION_HOST) if c["url"].endswith(path)),
+        "single_put": sum(1 for c in fakes.calls("PUT", hostname=REGION_HOST) if not c["url"].endswith(path)),
+        "single_delete": sum(1 for c in fakes.calls("DELETE", hostname=REGION_HOST) if not c["url"].endswith(path)),
+        "post": len(fakes.calls("POST", hostname=REGION_HOST)),
+    }
+    assert counts == expect, f"{name}: expected {expect}, got {counts}"
+    assert len(hw.recordsets) == 8, f"{name}: expected 8 recordsets, got {len(hw.recordsets)}"
+    assert all(not r["records"][0].startswith(("192.0.2.", "2001:db8:ffff")) for r in hw.recordsets.values()), f"{name}: stale records remain"
+    print(f"ok  {name:<38} {counts}")
+
+def main():
+    zero = {"batch_put": 0, "batch_delete": 0, "single_put": 0, "single_delete": 0, "post": 0}
+
+    run_scenario("empty zone -> creates", MockHuaweiDns(ZONE_ID), {**zero, "post": 8})
+
+    hw = MockHuaweiDns(ZONE_ID)
+    seed_stale(hw)
+    run_scenario("stale lines, batch API", hw, {**zero, "batch_put": 1})
+
+    hw = MockHuaweiDns(ZONE_ID)
+    seed_stale(hw)
+    for line in ("Jiaoyuwang", "Qita", "Tietong"):
+        hw.add(HOSTNAME, "A", line, ["192.0.2.99"])
+    run_scenario("stale lines + orphans", hw, {**zero, "batch_put": 1, "batch_delete": 1})
+
+    hw = MockHuaweiDns(ZONE_ID, batch_enabled=False)
+    seed_stale(hw)
+    run_scenario("batch rejected -> single fallback", hw, {**zero, "batch_put": 1, "single_put": 8})
+
+    hw = MockHuaweiDns(ZONE_ID)
+    ids = seed_stale(hw)
+    hw.batch_reject_ids = {ids[0], ids[3]}
+    run_scenario("partial batch -> fallback for rejects", hw, {**zero, "batch_put": 1, "single_put": 2})
+
+    hw = MockHuaweiDns(ZONE_ID)
+    seed_stale(hw)
+    run_scenario("HW_BATCH_WRITES=0", hw, {**zero, "single_put": 8}, HW_BATCH_WRITES="0")
+
+if __name__ == "__main__":
+    main()
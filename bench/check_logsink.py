@@ -0,0 +1,127 @@
+"""Checks for the buffered LogSink behind the /api/sync log stream.
+
+Run from the repository root:
+
+    python bench/check_logsink.py
+
+Feeds records straight into a LogSink over a recording writer and asserts when chunks are written
+(size and time thresholds, close), which levels survive, that a failing writer marks the sink
+`failed`, and that NDJSON output is one JSON object per line. The last scenario goes through
+/api/sync to check the stream level is independent of LOG_LEVEL.
+"""
+import asyncio, json
+
+from harness import ZONE_ID, make_worker, reset_isolate
+import fakes
+import js
+from fakes import FakeRequest, read_body
+from logsink import LogSink, make_record
+from mock_hw import MockHuaweiDns
+from mock_wetest import MockWetest
+
+class RecordingWriter:
+    """Keeps every chunk; raises on each write once `fail` is set."""
+    def __init__(self):
+        self.chunks = []
+        self.fail = False
+        self.attempts = 0
+        self.closed = False
+
+    async def write(self, chunk):
+        self.attempts += 1
+        if self.fail:
+            raise ConnectionResetError("client went away")
+        self.chunks.append(chunk.decode("utf-8"))
+
+    async def close(self):
+        self.closed = True
+
+def open_sink(**options):
+    writer = RecordingWriter()
+    return writer, LogSink(writer, js.TextEncoder.new(), **options)
+
+async def emit(sink, count, level="INFO", message="record"):
+    for i in range(count):
+        await sink.emit(make_record(level, "CHECK", f"{message} {i}"))
+
+async def size_threshold():
+    writer, sink = open_sink(flush_bytes=300, flush_ms=0)
+    await emit(sink, 3)
+    assert writer.chunks == [] and sink.pending_bytes < 300, sink.pending_bytes
+    while not writer.chunks:
+        await emit(sink, 1)
+    assert len(writer.chunks) == 1 and len(writer.chunks[0].encode("utf-8")) >= 300 and sink.lines == []
+    await emit(sink, 1)
+    await sink.close()
+    assert len(writer.chunks) == 2 and writer.closed, writer.chunks
+    return "chunk written once flush_bytes is reached, remainder on close"
+
+async def time_threshold():
+    writer, sink = open_sink(flush_bytes=1 << 20, flush_ms=20)
+    await emit(sink, 5)
+    await asyncio.sleep(0.005)
+    assert writer.chunks == [] and sink.timer is not None
+    await asyncio.sleep(0.03)
+    assert len(writer.chunks) == 1 and writer.chunks[0].count("\n") == 5 and sink.timer is None, writer.chunks
+    await emit(sink, 1)
+    await sink.flush()
+    await asyncio.sleep(0.03)
+    assert len(writer.chunks) == 2, "an explicit flush should cancel the pending timer"
+    return "records coalesce until flush_ms, explicit flush cancels the timer"
+
+async def level_filter():
+    writer, sink = open_sink(level="WARN", flush_ms=0)
+    for level in ("DEBUG", "INFO", "WARN", "ERROR", "FATAL"):
+        await emit(sink, 1, level)
+    await sink.close()
+    levels = [line.split("] [")[1] for line in writer.chunks[0].splitlines()]
+    assert levels == ["WARN", "ERROR", "FATAL"], levels
+    writer, sink = open_sink(level="bogus", flush_ms=0)
+    await emit(sink, 1, "DEBUG")
+    await emit(sink, 1, "INFO")
+    await sink.close()
+    assert writer.chunks[0].count("\n") == 1 and "[INFO]" in writer.chunks[0], "unknown level should mean INFO"
+    return "records below the sink level dropped, unknown level -> INFO"
+
+async def failed_writer():
+    writer, sink = open_sink(flush_bytes=1, flush_ms=0)
+    await emit(sink, 1)
+    writer.fail = True
+    await emit(sink, 1)
+    assert sink.failed and writer.attempts == 2
+    await emit(sink, 3)
+    await sink.close()
+    assert writer.attempts == 2 and sink.lines == [] and writer.closed, writer.attempts
+    return "writer error sets failed; later records skipped, close still safe"
+
+async def ndjson_framing():
+    writer, sink = open_sink(fmt="ndjson", flush_bytes=400, flush_ms=0)
+    for i in range(12):
+        await sink.emit(make_record("INFO", "CHECK", f"line {i}\nwith \"quotes\"", phase="apply", type="A"))
+    await sink.close()
+    assert len(writer.chunks) > 1 and all(chunk.endswith("\n") for chunk in writer.chunks), writer.chunks
+    records = [json.loads(line) for line in "".join(writer.chunks).splitlines()]
+    assert [r["msg"] for r in records] == [f"line {i}\nwith \"quotes\"" for i in range(12)], records
+    assert all(r["phase"] == "apply" and r["type"] == "A" and r["ts"].endswith("+00:00") for r in records)
+    return f"ndjson: {len(writer.chunks)} chunks, every line one JSON record"
+
+async def stream_level(body_level):
+    reset_isolate(MockWetest(), MockHuaweiDns(ZONE_ID))
+    worker = make_worker(LOG_LEVEL="FATAL", LOG_FLUSH_MS="0")
+    body = {"token": "t", **({"level": body_level} if body_level else {})}
+    response = await worker.fetch(FakeRequest("https://cdn.example.com/api/sync", method="POST", body=json.dumps(body)))
+    return (await read_body(response)).decode("utf-8")
+
+async def stream_ignores_log_level():
+    text = await stream_level(None)
+    assert "[INFO]" in text and "Run finished (applied)" in text, text[:400]
+    text = await stream_level("error")
+    assert "[INFO]" not in text, text[:400]
+    return "LOG_LEVEL=FATAL: stream defaults to INFO, body level overrides"
+
+async def main():
+    for scenario in (size_threshold, time_threshold, level_filter, failed_writer, ndjson_framing, stream_ignores_log_level):
+        print(f"ok  {await scenario()}")
+
+if __name__ == "__main__":
+    fakes.run(main())
@@ -0,0 +1,89 @@
+"""Checks for the Prometheus exposition served by /api/metrics.
+
+Run from the repository root:
+
+    python bench/check_metrics.py
+
+Runs one sync against the mocks, records an outbound call to a host whose name holds a quote, a
+backslash and a newline, then fetches /api/metrics and parses every line against the text format:
+TYPE before samples, one contiguous block per family, summary samples named `_sum`/`_count`, and
+label values escaped so they round-trip.
+"""
+import re
+
+from harness import REGION_HOST, ZONE_ID, make_worker, reset_isolate
+import fakes
+from fakes import FakeRequest, read_body
+from metrics import METRIC_PREFIX, METRICS
+from mock_hw import MockHuaweiDns
+from mock_wetest import MockWetest
+
+HOSTILE_HOST = 'evil"host\\name\nX-Injected: 1'
+TYPE_RE = re.compile(r"^# TYPE ([a-zA-Z_:][a-zA-Z0-9_:]*) (counter|gauge|summary|histogram|untyped)$")
+SAMPLE_RE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{((?:[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\\n]|\\[\\"n])*",?)*)\})? (-?[0-9.e+-]+|NaN|[+-]Inf)$')
+LABEL_RE = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\\n]|\\[\\"n])*)"')
+SUMMARY_SUFFIXES = ("_sum", "_count")
+
+def unescape(value):
+    return re.sub(r'\\(.)', lambda m: "\n" if m.group(1) == "n" else m.group(1), value)
+
+def parse(text):
+    """{family: (type, [(sample name, {label: value}, value)])}; asserts the format on the way."""
+    families, current, closed = {}, None, set()
+    assert text.endswith("\n"), "exposition must end with a newline"
+    for number, line in enumerate(text[:-1].split("\n"), 1):
+        typed = TYPE_RE.match(line)
+        if typed:
+            name, kind = typed.groups()
+            assert name not in families, f"line {number}: second TYPE for {name}"
+            if current:
+                closed.add(current)
+            families[name], current = (kind, []), name
+            continue
+        assert not line.startswith("#"), f"line {number}: unexpected comment {line!r}"
+        sample = SAMPLE_RE.match(line)
+        assert sample, f"line {number}: not a valid sample: {line!r}"
+        name, labels, value = sample.groups()
+        family = name
+        if current and families[current][0] == "summary":
+            family = next((name[:-len(s)] for s in SUMMARY_SUFFIXES if name.endswith(s)), name)
+        assert family == current and family not in closed, f"line {number}: {name} outside its family block"
+        float(value)
+        families[current][1].append((name, {k: unescape(v) for k, v in LABEL_RE.findall(labels or "")}, value))
+    return families
+
+def main():
+    reset_isolate(MockWetest(), MockHuaweiDns(ZONE_ID))
+    worker = make_worker(LOG_LEVEL="FATAL")
+    METRICS.record_fetch(HOSTILE_HOST, "GET", 200, 10, 12.5)
+
+    async def scrape():
+        run, _ = worker.get_sync_engine().coordinate_sync("CRON")
+        await run.wait()
+        response = await worker.fetch(FakeRequest("https://cdn.example.com/api/metrics", headers={"authorization": "Bearer t"}))
+        return response, (await read_body(response)).decode("utf-8")
+    response, text = fakes.run(scrape())
+    assert response.status == 200 and response.headers.get("content-type").startswith("text/plain; version=0.0.4"), response.status
+    families = parse(text)
+    print(f"ok  {len(text.splitlines())} lines parse, {len(families)} families")
+
+    summary = families[f"{METRIC_PREFIX}_outbound_duration_ms"]
+    assert summary[0] == "summary", summary[0]
+    by_host = {}
+    for name, labels, value in summary[1]:
+        by_host.setdefault(labels["host"], {})[name.rsplit("_", 1)[1]] = float(value)
+    assert by_host[REGION_HOST]["count"] >= 1 and set(by_host[REGION_HOST]) == {"sum", "count"}, by_host[REGION_HOST]
+    assert f"{METRIC_PREFIX}_outbound_duration_ms_sum" not in families and f"{METRIC_PREFIX}_outbound_duration_ms_count" not in families
+    print("ok  outbound latency is one summary family with _sum and _count")
+
+    assert by_host[HOSTILE_HOST] == {"sum": 12.5, "count": 1}, by_host.get(HOSTILE_HOST)
+    hosts = {labels.get("host") for _, labels, _ in families[f"{METRIC_PREFIX}_outbound_requests_total"][1]}
+    assert HOSTILE_HOST in hosts, hosts
+    print("ok  quote, backslash and newline in a host label round-trip")
+
+    phases = families[f"{METRIC_PREFIX}_last_run_phase_duration_ms"][1]
+    assert phases and all(labels["phase"] for _, labels, _ in phases), phases
+    print(f"ok  last run phases exported ({', '.join(labels['phase'] for _, labels, _ in phases)})")
+
+if __name__ == "__main__":
+    main()
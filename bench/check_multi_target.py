@@ -0,0 +1,73 @@
+"""Checks for SYNC_TARGETS fan-out, against the mock upstream and one mock HW API per zone.
+
+Run from the repository root:
+
+    python bench/check_multi_target.py
+
+Asserts that upstream and topology are fetched once per run, that per-target limits and TTLs are
+applied in each zone, that one failing zone does not block the others, and that HW calls across
+targets respect the shared HW_MAX_INFLIGHT limit.
+"""
+import json
+
+from harness import REGION_HOST, WETEST_HOST, make_engine, reset_isolate
+import fakes
+from metrics import METRICS
+from mock_hw import MockHuaweiDns
+from mock_wetest import MockWetest
+
+TARGETS = [
+    {"hostname": "cdn.example.com", "zone_id": "zone-a"},
+    {"hostname": "edge.example.com", "zone_id": "zone-a", "max_ips": 2, "ttl": 300},
+    {"hostname": "cdn.example.net", "zone_id": "zone-b"},
+]
+
+class ZoneRouter:
+    """Dispatches HW requests to the mock for the zone in the path and tracks peak concurrency."""
+    def __init__(self, zones):
+        self.zones = zones
+        self.inflight = self.peak = 0
+
+    async def __call__(self, method, url, headers, body):
+        self.inflight += 1
+        self.peak = max(self.peak, self.inflight)
+        try:
+            zone = next((z for z in self.zones if f"/zones/{z}/" in url), None)
+            return await self.zones[zone or next(iter(self.zones))](method, url, headers, body)
+        finally:
+            self.inflight -= 1
+
+def run(zones, **env):
+    router = ZoneRouter(zones)
+    reset_isolate(MockWetest(), router)
+    env.setdefault("SYNC_TARGETS", json.dumps(TARGETS))
+    outcome = fakes.run(make_engine(LOG_LEVEL="FATAL", **env).perform_full_sync(force=True))
+    return outcome, router
+
+def main():
+    zones = {"zone-a": MockHuaweiDns("zone-a"), "zone-b": MockHuaweiDns("zone-b")}
+    outcome, _ = run(zones)
+    assert outcome == "applied", outcome
+    assert len(fakes.calls(hostname=WETEST_HOST)) == 2
+    assert len(fakes.calls("GET", "/v2.1/system-lines", REGION_HOST)) == 1
+    a, b = zones["zone-a"].recordsets.values(), zones["zone-b"].recordsets.values()
+    assert sum(r["name"] == "cdn.example.com." for r in a) == 8 and len(b) == 8
+    edge = [r for r in a if r["name"] == "edge.example.com."]
+    assert len(edge) == 8 and all(len(r["records"]) == 2 and r["ttl"] == 300 for r in edge), edge
+    print("ok  three targets, two zones, one upstream fetch")
+
+    zones = {"zone-a": MockHuaweiDns("zone-a"), "zone-b": MockHuaweiDns("zone-b", error_rate=1.0)}
+    outcome, _ = run(zones)
+    assert outcome == "halted", outcome
+    assert len(zones["zone-a"].recordsets) == 16 and not zones["zone-b"].recordsets
+    key = ("target_runs_total", (("outcome", "halted"), ("target", "cdn.example.net.")))
+    assert METRICS.counters.get(key) == 1
+    print("ok  failing zone is reported, others still applied")
+
+    zones = {"zone-a": MockHuaweiDns("zone-a", latency_ms=2), "zone-b": MockHuaweiDns("zone-b", latency_ms=2)}
+    outcome, router = run(zones, HW_MAX_INFLIGHT="2", HW_BATCH_WRITES="0")
+    assert outcome == "applied" and router.peak <= 2, (outcome, router.peak)
+    print(f"ok  HW_MAX_INFLIGHT=2 shared across targets (peak {router.peak})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Checks for the edge-cached page shell (PAGE_SHELL_CACHE=1), against the fake HTMLRewriter.
+
+Run from the repository root:
+
+    python bench/check_page_shell.py
+
+Asserts that the five per-request `data-field` spans are filled with escaped text, that /sync
+appends the trigger script, and that the shell itself is rendered once and then read from the
+Cache API.
+"""
+import asyncio, re
+
+from harness import make_worker, reset_isolate
+import fakes
+import index
+from fakes import FakeRequest, read_body
+
+HEADERS = {"cf-connecting-ip": "203.0.113.7", "cf-ray": "8f1e2d3c4b5a6978-HKG", "cf-ipcountry": "HK"}
+CF = {"colo": "HKG", "region": "Central & Western", "city": "<script>alert(1)</script>", "httpProtocol": "HTTP/2", "tlsVersion": "TLSv1.3"}
+
+async def get(worker, path):
+    response = await worker.fetch(FakeRequest(f"https://cdn.example.com{path}", headers=HEADERS, cf=CF))
+    html = (await read_body(response)).decode("utf-8")
+    while index._BACKGROUND_TASKS:
+        await asyncio.gather(*list(index._BACKGROUND_TASKS))
+    return response, html
+
+def fields(html):
+    return dict(re.findall(r'<span class="val" data-field="(\w+)">(.*?)</span>', html))
+
+async def filled_and_escaped():
+    reset_isolate()
+    worker = make_worker(PAGE_SHELL_CACHE="1")
+    response, html = await get(worker, "/")
+    assert response.headers.get("cache-control") == "no-store", "expected the shell path, not the inline fallback"
+    assert fields(html) == {
+        "clientIp": "203.0.113.7",
+        "rayId": "8f1e2d3c4b5a6978-HKG",
+        "colo": "HKG",
+        "location": "&lt;script&gt;alert(1)&lt;/script&gt;, Central &amp; Western, HK",
+        "protocol": "HTTP/2 / TLSv1.3",
+    }, fields(html)
+    assert "<script>alert(1)" not in html
+    assert "/api/sync" not in html, "no trigger script outside /sync"
+    return "five data-field spans filled, text escaped"
+
+async def sync_script_appended():
+    reset_isolate()
+    worker = make_worker(PAGE_SHELL_CACHE="1")
+    response, html = await get(worker, "/sync?token=t&dry_run=1")
+    assert response.headers.get("cache-control") == "no-store", "expected the shell path, not the inline fallback"
+    body = html[html.index("<body"):]
+    script = index.render_sync_script("t", dry_run=True)
+    assert body.count(script) == 1 and script + "</body>" in body, body[-400:]
+    assert len(fields(html)) == 5
+    return "/sync appends the trigger script before </body>"
+
+async def shell_cached():
+    reset_isolate()
+    worker = make_worker(PAGE_SHELL_CACHE="1")
+    _, first = await get(worker, "/")
+    shells = [key for key in fakes.CACHE if "/__shell/" in key]
+    assert len(shells) == 1, shells
+    original = index.render_shell
+    index.render_shell = lambda *args: (_ for _ in ()).throw(AssertionError("shell re-rendered on a cache hit"))
+    try:
+        _, second = await get(worker, "/")
+    finally:
+        index.render_shell = original
+    assert second == first
+    return "shell rendered once, then served from the Cache API"
+
+async def main():
+    for scenario in (filled_and_escaped, sync_script_appended, shell_cached):
+        print(f"ok  {await scenario()}")
+
+if __name__ == "__main__":
+    fakes.run(main())
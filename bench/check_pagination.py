@@ -0,0 +1,69 @@
+"""Checks for paginated recordset listing, against the local mock API.
+
+Run from the repository root:
+
+    python bench/check_pagination.py
+
+The zone holds the eight target A/AAAA recordsets interleaved with records of other types, and
+HW_PAGE_SIZE=2 spreads them over several listing pages. Asserts that every A/AAAA recordset is
+found, how many list calls were made, and that an unreadable page halts the run before any write.
+"""
+from harness import HOSTNAME, LINES, REGION_HOST, ZONE_ID, make_engine, reset_isolate
+import fakes
+from mock_hw import MockHuaweiDns
+from mock_wetest import MockWetest
+
+LIST_PATH = f"/v2.1/zones/{ZONE_ID}/recordsets"
+
+class FailingPage:
+    """Answers HTTP 500 for the listing page at `offset`, everything else from the mock."""
+    def __init__(self, hw, offset):
+        self.hw = hw
+        self.offset = offset
+
+    async def __call__(self, method, url, headers, body):
+        if method == "GET" and f"offset={self.offset}" in url:
+            return self.hw.reply({"code": "DNS.0001", "message": "Internal error"}, 500)
+        return await self.hw(method, url, headers, body)
+
+def seed_interleaved(hw):
+    """Stale A/AAAA recordsets on every line, with a TXT, MX or CNAME after each pair."""
+    others = iter([("TXT", ['"v=spf1 -all"']), ("MX", ["10 mx.example.com."]), ("CNAME", ["edge.example.net."])] * 2)
+    for line in ("default_view", *LINES.values()):
+        hw.add(HOSTNAME, "A", line, ["192.0.2.1"])
+        hw.add(HOSTNAME, "AAAA", line, ["2001:db8:ffff::1"])
+        rtype, records = next(others)
+        hw.add(HOSTNAME, rtype, line, records)
+    return len(hw.recordsets)
+
+def run_scenario(name, handler):
+    reset_isolate(MockWetest(), handler)
+    outcome = fakes.run(make_engine(LOG_LEVEL="FATAL", HW_PAGE_SIZE="2").perform_full_sync(force=True))
+    lists = len(fakes.calls("GET", LIST_PATH, REGION_HOST))
+    writes = len(fakes.calls(hostname=REGION_HOST)) - len(fakes.calls("GET", hostname=REGION_HOST))
+    print(f"ok  {name:<40} outcome={outcome} list calls={lists} writes={writes}")
+    return outcome, lists, writes
+
+def main():
+    hw = MockHuaweiDns(ZONE_ID)
+    total = seed_interleaved(hw)
+    outcome, lists, writes = run_scenario("12 recordsets over pages of 2", hw)
+    assert outcome == "applied", outcome
+    assert lists == total // 2, lists
+    # Every stale A/AAAA recordset was found: all were updated in place, none created or deleted.
+    assert writes == 1 and not fakes.calls("POST", hostname=REGION_HOST), writes
+    assert len(hw.recordsets) == total
+    state = hw.state()
+    assert all(not ips[0].startswith(("192.0.2.", "2001:db8:ffff")) for (rtype, _), ips in state.items() if rtype in ("A", "AAAA")), state
+    assert sum(rtype not in ("A", "AAAA") for rtype, _ in state) == total - 8, state
+
+    hw = MockHuaweiDns(ZONE_ID)
+    seed_interleaved(hw)
+    before = hw.state()
+    outcome, lists, writes = run_scenario("middle page fails -> halted", FailingPage(hw, 4))
+    assert outcome == "halted", outcome
+    assert lists == 3, lists # offsets 0, 2 and the failing 4; nothing past it
+    assert writes == 0 and hw.state() == before, hw.state()
+
+if __name__ == "__main__":
+    main()
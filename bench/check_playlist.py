@@ -0,0 +1,146 @@
+"""Checks for the same-origin playlist proxy, against a local mock of the playlist host.
+
+Run from the repository root:
+
+    python bench/check_playlist.py
+
+Each scenario starts from an empty Cache API and isolate state and asserts what the page and
+`/api/playlist` serve and how many requests (and conditional requests) reached the playlist host.
+"""
+import asyncio, json
+
+from harness import make_worker
+import fakes
+import index, playlist
+from fakes import FakeRequest, FakeResponse, read_body
+
+MUSIC_HOST = "files.example.com"
+MUSIC_URL = f"https://{MUSIC_HOST}/data/music.json"
+TRACKS = [
+    {"title": "One", "artist": "A", "audio": "https://files.example.com/1.mp3", "cover": "https://files.example.com/1.jpg", "lyrics": "..."},
+    {"title": "Two", "artist": "B", "audio": "https://files.example.com/2.mp3", "cover": "javascript:alert(1)"},
+    {"title": "No audio", "artist": "C", "cover": "https://files.example.com/3.jpg"},
+    "not a track",
+]
+
+class MockMusicHost:
+    """Serves the playlist with an ETag and answers matching If-None-Match with 304."""
+    def __init__(self, payload=TRACKS, status=200):
+        self.payload = payload
+        self.status = status
+        self.conditional = 0
+
+    async def __call__(self, method, url, headers, body):
+        if self.status != 200:
+            return FakeResponse("upstream down", self.status)
+        etag = '"v1"'
+        if (headers or {}).get("If-None-Match") == etag:
+            self.conditional += 1
+            return FakeResponse("", 304, {"ETag": etag})
+        return FakeResponse(json.dumps(self.payload), 200, {"ETag": etag, "Last-Modified": "Mon, 05 Oct 2026 08:00:00 GMT"})
+
+def reset(host):
+    fakes.reset()
+    playlist._PLAYLISTS.clear()
+    playlist._REFRESHING.clear()
+    playlist._FAILED_AT.clear()
+    fakes.route(MUSIC_HOST, host)
+
+async def settle():
+    while index._BACKGROUND_TASKS:
+        await asyncio.gather(*list(index._BACKGROUND_TASKS))
+
+async def get(worker, path, headers=None):
+    response = await worker.fetch(FakeRequest(f"https://cdn.example.com{path}", headers=headers))
+    return response, (await read_body(response)).decode("utf-8")
+
+def check(name, condition, detail=""):
+    assert condition, f"{name}: {detail}"
+
+async def cold_page_then_proxied():
+    host = MockMusicHost()
+    reset(host)
+    worker = make_worker(MUSIC_JSON_URL=MUSIC_URL)
+    _, html = await get(worker, "/")
+    check("cold page", f'data-music-url="{MUSIC_URL}"' in html, "cold page should fall back to the upstream URL")
+    await settle()
+
+    response, html = await get(worker, "/")
+    current = playlist._PLAYLISTS[MUSIC_URL]
+    check("warm page", f'data-music-url="{current.path}"' in html, "warm page should use /api/playlist")
+    start = int(html.split('data-start-track="', 1)[1].split('"', 1)[0])
+    cover = current.tracks[start]["cover"]
+    link = response.headers.get("link")
+    check("cover preload", f"<{current.path}>; rel=preload; as=fetch" in link and (f"<{cover}>; rel=preload; as=image" in link if cover else "as=image" not in link), link)
+    check("one fetch", len(fakes.calls(hostname=MUSIC_HOST)) == 1, f"{len(fakes.calls(hostname=MUSIC_HOST))} upstream calls")
+    return "cold page falls back, then serves same-origin copy"
+
+async def validated_and_versioned():
+    reset(MockMusicHost())
+    worker = make_worker(MUSIC_JSON_URL=MUSIC_URL)
+    response, body = await get(worker, "/api/playlist")
+    tracks = json.loads(body)
+    check("validated", [t["title"] for t in tracks] == ["One", "Two"] and tracks[1]["cover"] == "" and "lyrics" not in tracks[0], body)
+    check("ttl headers", response.headers.get("cache-control") == "public, max-age=300", response.headers.get("cache-control"))
+
+    current = playlist._PLAYLISTS[MUSIC_URL]
+    response, _ = await get(worker, current.path)
+    check("immutable", "immutable" in response.headers.get("cache-control"), response.headers.get("cache-control"))
+    response, _ = await get(worker, current.path, {"if-none-match": current.etag})
+    check("304", response.status == 304, response.status)
+    return "entries validated, versioned URL immutable, 304 on ETag"
+
+async def shared_through_cache_api():
+    reset(MockMusicHost())
+    await get(make_worker(MUSIC_JSON_URL=MUSIC_URL), "/api/playlist")
+    playlist._PLAYLISTS.clear() # a new isolate
+    _, html = await get(make_worker(MUSIC_JSON_URL=MUSIC_URL), "/")
+    check("cache hit", "/api/playlist?v=" in html and len(fakes.calls(hostname=MUSIC_HOST)) == 1, "new isolate should read the Cache API")
+    return "new isolate reads Cache API, no upstream call"
+
+async def revalidated_with_etag():
+    host = MockMusicHost()
+    reset(host)
+    worker = make_worker(MUSIC_JSON_URL=MUSIC_URL, PLAYLIST_TTL="0")
+    await get(worker, "/api/playlist")
+    _, html = await get(worker, "/")
+    await settle()
+    check("stale served", "/api/playlist?v=" in html, "stale copy should still be served")
+    check("conditional", host.conditional == 1, f"{host.conditional} conditional requests")
+    return "past TTL: stale served, revalidated with If-None-Match"
+
+async def upstream_failures():
+    reset(MockMusicHost(status=503))
+    worker = make_worker(MUSIC_JSON_URL=MUSIC_URL)
+    response, _ = await get(worker, "/api/playlist")
+    check("502", response.status == 502, response.status)
+    await get(worker, "/api/playlist")
+    check("backoff", len(fakes.calls(hostname=MUSIC_HOST)) == 1, f"{len(fakes.calls(hostname=MUSIC_HOST))} upstream calls within the backoff")
+    reset(MockMusicHost(payload={"tracks": []}))
+    response, _ = await get(worker, "/api/playlist")
+    check("invalid", response.status == 502, response.status)
+    _, html = await get(worker, "/")
+    check("fallback", f'data-music-url="{MUSIC_URL}"' in html, "page should fall back to the upstream URL")
+    await settle()
+    return "upstream down or invalid -> 502 with backoff, page falls back"
+
+async def header_safe_urls():
+    reset(MockMusicHost(payload=[
+        {"title": "Split", "artist": "A", "audio": "https://files.example.com/1.mp3\r\nX-Injected: 1", "cover": "https://files.example.com/1.jpg"},
+        {"title": "Odd cover", "artist": "B", "audio": "https://files.example.com/2.mp3", "cover": "https://files.example.com/a,b <c>.jpg"},
+    ]))
+    worker = make_worker(MUSIC_JSON_URL=MUSIC_URL)
+    await get(worker, "/api/playlist")
+    response, _ = await get(worker, "/")
+    link = response.headers.get("link")
+    check("page", response.status == 200, response.status)
+    check("dropped", [t["title"] for t in playlist._PLAYLISTS[MUSIC_URL].tracks] == ["Odd cover"], "track with a CR/LF in its URL should be dropped")
+    check("encoded", "<https://files.example.com/a%2Cb%20%3Cc%3E.jpg>; rel=preload; as=image" in link, link)
+    return "control characters dropped, <>, and spaces percent-encoded in Link"
+
+async def main():
+    for scenario in (cold_page_then_proxied, validated_and_versioned, shared_through_cache_api, revalidated_with_etag, upstream_failures, header_safe_urls):
+        print(f"ok  {await scenario()}")
+
+if __name__ == "__main__":
+    fakes.run(main())
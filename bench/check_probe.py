@@ -0,0 +1,55 @@
+"""Checks for the optional candidate probe stage, against the fake sockets API.
+
+Run from the repository root:
+
+    python bench/check_probe.py
+
+Each scenario runs a full forced sync with PROBE_CANDIDATES=1 and asserts what was published.
+"""
+import time
+
+from harness import ZONE_ID, make_engine, reset_isolate
+import fakes
+from mock_hw import MockHuaweiDns
+from mock_wetest import MockWetest, wetest_payload
+
+V4 = wetest_payload("v4")
+ALL_IPS = [item["ip"] for family in ("v4", "v6") for items in wetest_payload(family).values() for item in items]
+
+def run_scenario(name, check, sockets=None, **env):
+    hw = MockHuaweiDns(ZONE_ID)
+    reset_isolate(MockWetest(), hw)
+    for ip, behaviour in (sockets or {}).items():
+        fakes.socket_behaviour(ip, *behaviour)
+    started = time.perf_counter()
+    fakes.run(make_engine(PROBE_CANDIDATES="1", LOG_LEVEL="ERROR", **env).perform_full_sync(force=True))
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    check(hw.state(), elapsed_ms)
+    print(f"ok  {name:<40} {elapsed_ms:7.1f} ms")
+
+def main():
+    cm = [item["ip"] for item in V4["CM"]]
+
+    def dropped(state, _):
+        assert state[("A", "Yidong")] == [cm[2]], state[("A", "Yidong")]
+    run_scenario("unreachable IPs dropped", dropped, {cm[0]: (1, False), cm[1]: (1, False)})
+
+    def demoted(state, _):
+        assert state[("A", "Yidong")] == sorted(cm), state[("A", "Yidong")]
+    run_scenario("PROBE_MODE=demote keeps them", demoted, {cm[0]: (1, False)}, PROBE_MODE="demote")
+
+    def slow_dropped(state, _):
+        assert cm[0] not in state[("A", "Yidong")], state[("A", "Yidong")]
+    run_scenario("handshake over PROBE_TIMEOUT_MS dropped", slow_dropped, {cm[0]: (300, True)}, PROBE_TIMEOUT_MS="50")
+
+    def fail_open(state, _):
+        assert state[("A", "Yidong")] == sorted(cm), state[("A", "Yidong")]
+    run_scenario("all probes fail -> publish unprobed", fail_open, {ip: (1, False) for ip in ALL_IPS})
+
+    def budget(state, elapsed_ms):
+        assert all(len(ips) == 3 for ips in state.values()), state
+        assert elapsed_ms < 400, elapsed_ms
+    run_scenario("budget bounds the probe stage", budget, {ip: (100, True) for ip in ALL_IPS}, PROBE_BUDGET_MS="150", PROBE_CONCURRENCY="4")
+
+if __name__ == "__main__":
+    main()
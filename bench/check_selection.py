@@ -0,0 +1,62 @@
+"""Checks for hysteresis in IP selection, against the mock upstream and mock HW DNS API.
+
+Run from the repository root:
+
+    python bench/check_selection.py
+
+Each scenario publishes the mock upstream's five CM addresses, then offers one new CM challenger
+on a second run and asserts whether it displaced an incumbent and what
+`selection_changes_avoided_total` counted.
+"""
+import json
+
+from harness import ZONE_ID, make_engine, reset_isolate
+import fakes
+from fakes import FakeResponse
+from metrics import METRICS
+from mock_hw import MockHuaweiDns
+from mock_wetest import wetest_payload
+
+CHALLENGER = "198.51.100.9"
+
+class ScriptedUpstream:
+    """Serves the five-per-carrier payload, plus `challenger` at the head of the v4 CM list when set."""
+    def __init__(self):
+        self.challenger = None
+
+    async def __call__(self, method, url, headers, body):
+        family = "v6" if url.endswith("type=v6") else "v4"
+        info = wetest_payload(family, per_carrier=5)
+        if family == "v4" and self.challenger is not None:
+            info["CM"].insert(0, {"ip": CHALLENGER, "latency": self.challenger, "loss": "0.00", "speed": 2000})
+        return FakeResponse(json.dumps({"status": True, "code": 200, "info": info}))
+
+def run_scenario(name, latency, replaced, **env):
+    upstream, hw = ScriptedUpstream(), MockHuaweiDns(ZONE_ID)
+    reset_isolate(upstream, hw)
+    engine = make_engine(LOG_LEVEL="FATAL", **env)
+    fakes.run(engine.perform_full_sync(force=True))
+    incumbents = hw.state()[("A", "Yidong")]
+    assert len(incumbents) == 5 and CHALLENGER not in incumbents, incumbents
+
+    upstream.challenger = latency
+    fakes.run(engine.perform_full_sync(force=True))
+    published = hw.state()[("A", "Yidong")]
+    avoided = sum(v for (n, _), v in METRICS.counters.items() if n == "selection_changes_avoided_total")
+    if replaced:
+        assert CHALLENGER in published and max(incumbents) not in published, published
+        assert avoided == 0, avoided
+    else:
+        assert published == incumbents, published
+        assert avoided == 1, avoided
+    print(f"ok  {name:<44} avoided={avoided}")
+
+def main():
+    # Incumbents list at 100..140 ms; the worst scores 140 ms and the default 15% margin puts the
+    # bar for a challenger at 119 ms.
+    run_scenario("challenger within margin -> incumbents held", 130, replaced=False)
+    run_scenario("challenger past margin -> replaces worst", 100, replaced=True)
+    run_scenario("SELECTION_MARGIN_PCT=0 -> 130 ms replaces", 130, replaced=True, SELECTION_MARGIN_PCT="0")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Checks for single-flight sync coordination, through `Default.fetch` and `Default.scheduled`.
+
+Run from the repository root:
+
+    python bench/check_single_flight.py
+
+Triggers overlap while a slow mock upstream keeps the first run in progress. Asserts how many runs
+and upstream fetches happened, which options each run had, and what every log stream received.
+"""
+import asyncio, json
+
+from harness import WETEST_HOST, ZONE_ID, make_worker, reset_isolate
+import fakes
+import js, sync
+from fakes import FakeRequest, read_body
+from metrics import METRICS
+from mock_hw import MockHuaweiDns
+from mock_wetest import MockWetest
+
+class BrokenWriter:
+    """A client that disconnects after its first chunk."""
+    def __init__(self):
+        self.writes = 0
+
+    async def write(self, chunk):
+        self.writes += 1
+        if self.writes > 1:
+            raise ConnectionResetError("client went away")
+
+    async def close(self):
+        pass
+
+def sync_request(worker, **options):
+    body = {"token": "t", "level": "INFO", **options}
+    return worker.fetch(FakeRequest("https://cdn.example.com/api/sync", method="POST", body=json.dumps(body)))
+
+async def body_of(response):
+    return (await read_body(response)).decode("utf-8")
+
+def setup():
+    hw = MockHuaweiDns(ZONE_ID)
+    reset_isolate(MockWetest(latency_ms=20), hw)
+    return make_worker(LOG_LEVEL="FATAL", LOG_FLUSH_MS="0"), hw
+
+def runs():
+    return [(trace.trigger, trace.mode) for trace in METRICS.runs]
+
+async def coalesced():
+    worker, _ = setup()
+    cron = asyncio.ensure_future(worker.scheduled(None, None, None))
+    await asyncio.sleep(0.005) # the run is now waiting on the upstream
+    first = await sync_request(worker)
+    await asyncio.sleep(0.005)
+    second = await sync_request(worker)
+    first, second = await asyncio.gather(body_of(first), body_of(second))
+    await cron
+
+    assert runs() == [("CRON", "synchronization")], runs()
+    assert len(fakes.calls(hostname=WETEST_HOST)) == 2, "one upstream fetch (v4 + v6) expected"
+    opening, closing = "sequence triggered via CRON", "Run finished (applied)"
+    # Clients that attach late get the records they missed replayed, then the live tail, in order.
+    for body in (first, second):
+        assert "already in progress" in body, body
+        assert opening in body and body.index(opening) < body.index(closing), body
+    return "cron + two /api/sync calls -> one run, one upstream fetch, replay then tail"
+
+async def cron_during_manual_run():
+    worker, _ = setup()
+    manual = await sync_request(worker)
+    await asyncio.sleep(0.005)
+    await asyncio.gather(worker.scheduled(None, None, None), body_of(manual))
+
+    # The API run may reuse a cached payload, so cron gets its own run with a fresh fetch.
+    assert runs() == [("API", "synchronization"), ("CRON", "synchronization")], runs()
+    assert len(fakes.calls(hostname=WETEST_HOST)) == 4, len(fakes.calls(hostname=WETEST_HOST))
+    return "cron during a manual run -> follow-up run with a fresh upstream fetch"
+
+async def detached():
+    worker, _ = setup()
+    response = await sync_request(worker)
+    await asyncio.sleep(0.005)
+    engine = worker.get_sync_engine()
+    run = sync._ACTIVE_SYNC["run"]
+    writer = BrokenWriter()
+    sink = engine.open_log_sink(writer, js.TextEncoder.new(), level="DEBUG")
+    await engine.stream_run("API", sink)
+    assert sink in run.sinks
+    while not sink.failed and not run.closed:
+        await asyncio.sleep(0.001)
+    assert sink.failed and not run.closed and sink not in run.sinks, "sink should detach mid-run"
+    assert "Run finished (applied)" in await body_of(response)
+    assert writer.writes == 2, writer.writes
+    return "disconnected client detached, run and other clients unaffected"
+
+async def queued_behind_dry_run():
+    worker, hw = setup()
+    dry = await sync_request(worker, dry_run=True)
+    await asyncio.sleep(0.005)
+    real = await sync_request(worker)
+    cron = asyncio.ensure_future(worker.scheduled(None, None, None))
+    await asyncio.sleep(0)
+    again = await sync_request(worker)
+    dry, real, again = await asyncio.gather(body_of(dry), body_of(real), body_of(again))
+    await cron
+
+    # The real API call and cron share one follow-up run; cron asks for a fresh upstream fetch.
+    assert runs() == [("API", "dry run"), ("CRON", "synchronization")], runs()
+    assert "Run finished (dry_run)" in dry and "Queued a follow-up synchronization run" in real, real
+    assert "Run finished (applied)" in real and "Run finished (applied)" in again
+    assert "Run finished (dry_run)" not in real, "a queued client should only see its own run"
+    assert len(hw.recordsets) == 8
+    return "real triggers during a dry run -> one follow-up real run"
+
+async def queued_behind_unforced():
+    worker, _ = setup()
+    plain = await sync_request(worker)
+    await asyncio.sleep(0.005)
+    dry = await sync_request(worker, dry_run=True)
+    forced = await sync_request(worker, force=True)
+    await asyncio.gather(body_of(plain), body_of(dry), body_of(forced))
+
+    # The follow-up is forced: it re-verifies the zone ("noop") instead of skipping on the fingerprint.
+    assert runs() == [("API", "synchronization"), ("API", "synchronization")], runs()
+    assert [trace.outcome for trace in METRICS.runs] == ["applied", "noop"], [trace.outcome for trace in METRICS.runs]
+    assert sync._ACTIVE_SYNC == {"run": None, "next": None}, sync._ACTIVE_SYNC
+    return "dry run joins a real run, forced trigger queues a follow-up"
+
+async def string_flags():
+    worker, _ = setup()
+    body = await body_of(await sync_request(worker, dry_run="false", force="0"))
+    assert runs() == [("API", "synchronization")] and "Run finished (applied)" in body, body
+    response = await sync_request(worker, force="maybe")
+    assert response.status == 400 and len(METRICS.runs) == 1, response.status
+    return '"false"/"0" read as false, other strings rejected with 400'
+
+async def main():
+    for scenario in (coalesced, cron_during_manual_run, detached, queued_behind_dry_run, queued_behind_unforced, string_flags):
+        print(f"ok  {await scenario()}")
+
+if __name__ == "__main__":
+    fakes.run(main())
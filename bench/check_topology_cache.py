@@ -0,0 +1,88 @@
+"""Checks for the stale-while-revalidate HW line topology cache, against the local mock API.
+
+Run from the repository root:
+
+    python bench/check_topology_cache.py
+
+Each scenario calls `resolve_line_map` directly and asserts how many system-lines downloads
+reached the mock, which map was served and what the isolate and KV tiers hold afterwards.
+"""
+import asyncio, time
+
+from harness import REGION_HOST, ZONE_ID, make_engine, reset_isolate
+import fakes
+import index, sync
+from mock_hw import MockHuaweiDns
+
+STALE_MAP = {"CM": "stale-cm", "CU": "stale-cu", "CT": "stale-ct"}
+
+def downloads():
+    return len(fakes.calls("GET", "/v2.1/system-lines", REGION_HOST))
+
+async def settle():
+    while index._BACKGROUND_TASKS:
+        await asyncio.gather(*list(index._BACKGROUND_TASKS))
+
+def setup(**mock):
+    reset_isolate(hw=MockHuaweiDns(ZONE_ID, **mock))
+    engine = make_engine(LOG_LEVEL="FATAL", UPSTREAM_RETRIES="0", TOPOLOGY_TTL="3600")
+    return engine, engine.get_hw_client()
+
+async def seed_stale(engine, hw, age):
+    entry = {"line_map": STALE_MAP, "fetched_at": time.time() - age}
+    sync._TOPOLOGY_CACHE[hw.host] = dict(entry)
+    await engine.kv_put_json(f"topology:{hw.host}", entry)
+
+async def cold_then_cached():
+    engine, hw = setup()
+    first = await engine.resolve_line_map(hw)
+    second = await engine.resolve_line_map(hw)
+    assert downloads() == 1 and first == second and first["CM"] == "Yidong", (downloads(), first)
+    sync._TOPOLOGY_CACHE.clear() # a new isolate
+    third = await engine.resolve_line_map(hw)
+    assert downloads() == 1 and third == first, "a new isolate should read the KV copy"
+    return "cold miss downloads once; isolate and KV tiers serve the rest"
+
+async def stale_served_and_revalidated_once():
+    engine, hw = setup(latency_ms=20)
+    await seed_stale(engine, hw, age=7200)
+    served = await asyncio.gather(*(engine.resolve_line_map(hw) for _ in range(3)))
+    assert all(m == STALE_MAP for m in served), served
+    assert hw.host in sync._TOPOLOGY_REFRESHING
+    await settle()
+    assert downloads() == 1, f"{downloads()} downloads; expected one refresh in flight"
+    assert hw.host not in sync._TOPOLOGY_REFRESHING
+    fresh = await engine.resolve_line_map(hw)
+    stored = await engine.kv_get_json(f"topology:{hw.host}")
+    assert fresh["CM"] == "Yidong" and stored["line_map"] == fresh and time.time() - stored["fetched_at"] < 60, stored
+    await settle()
+    assert downloads() == 1, "a fresh entry must not trigger another refresh"
+    return "past TTL: stale map served, one background refresh"
+
+async def within_ttl_no_refresh():
+    engine, hw = setup()
+    await seed_stale(engine, hw, age=60)
+    served = await engine.resolve_line_map(hw)
+    await settle()
+    assert served == STALE_MAP and downloads() == 0, (served, downloads())
+    return "within TTL: cached map served, no download"
+
+async def failed_refresh_keeps_stale():
+    engine, hw = setup(error_rate=1.0)
+    await seed_stale(engine, hw, age=7200)
+    assert await engine.resolve_line_map(hw) == STALE_MAP
+    await settle()
+    stored = await engine.kv_get_json(f"topology:{hw.host}")
+    assert stored["line_map"] == STALE_MAP and sync._TOPOLOGY_CACHE[hw.host]["line_map"] == STALE_MAP, stored
+    assert hw.host not in sync._TOPOLOGY_REFRESHING
+    await engine.resolve_line_map(hw)
+    await settle()
+    assert downloads() == 2, "the next call should retry the refresh"
+    return "failed refresh keeps the stale map and retries next time"
+
+async def main():
+    for scenario in (cold_then_cached, stale_served_and_revalidated_once, within_ttl_no_refresh, failed_refresh_keeps_stale):
+        print(f"ok  {await scenario()}")
+
+if __name__ == "__main__":
+    fakes.run(main())
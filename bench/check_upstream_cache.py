@@ -0,0 +1,41 @@
+"""Checks for the last-good upstream payload cache, against the mock upstream and HW API.
+
+Run from the repository root:
+
+    python bench/check_upstream_cache.py
+
+A first sync fills the cache; each scenario then ages it, breaks the upstream or both, and asserts
+how many upstream calls the second sync made and whether it still published records.
+"""
+from harness import WETEST_HOST, ZONE_ID, make_engine, reset_isolate
+import fakes
+from mock_hw import MockHuaweiDns
+from mock_wetest import MockWetest
+
+def run_scenario(name, expect_calls, expect_outcome, age=0, upstream_down=False, prefer_cached=False, **env):
+    wetest = MockWetest()
+    reset_isolate(wetest, MockHuaweiDns(ZONE_ID))
+    engine = make_engine(LOG_LEVEL="FATAL", UPSTREAM_RETRIES="0", **env)
+    fakes.run(engine.perform_full_sync(force=True))
+
+    for family in ("v4", "v6"):
+        entry = fakes.run(engine.kv_get_json(f"upstream:{family}"))
+        entry["fetched_at"] -= age
+        fakes.run(engine.kv_put_json(f"upstream:{family}", entry))
+    wetest.error_rate = 1.0 if upstream_down else 0.0
+    fakes.CALLS.clear()
+
+    outcome = fakes.run(engine.perform_full_sync(force=True, prefer_cached=prefer_cached))
+    calls = len(fakes.calls(hostname=WETEST_HOST))
+    assert (calls, outcome) == (expect_calls, expect_outcome), f"{name}: expected {(expect_calls, expect_outcome)}, got {(calls, outcome)}"
+    print(f"ok  {name:<48} upstream calls={calls} outcome={outcome}")
+
+def main():
+    run_scenario("manual trigger, fresh cache -> reuse", 0, "noop", age=60, prefer_cached=True)
+    run_scenario("manual trigger, cache past freshness -> fetch", 2, "noop", age=600, prefer_cached=True)
+    run_scenario("cron, fresh cache -> fetch", 2, "noop", age=60)
+    run_scenario("upstream down -> stale fallback", 2, "noop", age=3600, upstream_down=True)
+    run_scenario("upstream down, cache too old -> halt", 2, "halted", age=86400, upstream_down=True)
+
+if __name__ == "__main__":
+    main()
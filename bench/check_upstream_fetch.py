@@ -0,0 +1,46 @@
+"""Checks for the upstream fetch path: hedged requests, per-attempt timeouts and bounded retries.
+
+Run from the repository root:
+
+    python bench/check_upstream_fetch.py
+
+Each scenario fetches one upstream family through `get_wetest_ips` against a mock whose latency
+and failure rate are injected, and asserts how many requests were sent, how long the fetch took
+and whether it returned a payload.
+"""
+import time
+
+from harness import WETEST_HOST, make_engine, reset_isolate
+import fakes
+from mock_wetest import MockWetest
+
+def run_scenario(name, wetest, **env):
+    reset_isolate(wetest)
+    engine = make_engine(LOG_LEVEL="FATAL", **env)
+    started = time.perf_counter()
+    info = fakes.run(engine.get_wetest_ips("v4"))
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    calls = len(fakes.calls(hostname=WETEST_HOST))
+    print(f"ok  {name:<44} calls={calls} {elapsed_ms:6.1f} ms")
+    return info, calls, elapsed_ms
+
+def main():
+    info, calls, elapsed_ms = run_scenario("stalled primary -> hedge wins", MockWetest(latency_schedule=[2000]), UPSTREAM_HEDGE_MS="50", UPSTREAM_RETRIES="0")
+    assert info and calls == 2, (info, calls)
+    assert elapsed_ms < 500, f"hedge should answer long before the stalled primary ({elapsed_ms:.0f} ms)"
+
+    info, calls, _ = run_scenario("fast primary -> no hedge sent", MockWetest(latency_ms=5), UPSTREAM_HEDGE_MS="50", UPSTREAM_RETRIES="0")
+    assert info and calls == 1, (info, calls)
+
+    info, calls, _ = run_scenario("HTTP 503 every time -> 1 + 2 retries", MockWetest(error_rate=1.0), UPSTREAM_RETRIES="2")
+    assert info is None and calls == 3, (info, calls)
+
+    info, calls, elapsed_ms = run_scenario("timeout every time -> 1 + 1 retry", MockWetest(latency_ms=1000), UPSTREAM_TIMEOUT_MS="50", UPSTREAM_RETRIES="1")
+    assert info is None and calls == 2, (info, calls)
+    assert elapsed_ms < 600, f"each attempt should abort at UPSTREAM_TIMEOUT_MS ({elapsed_ms:.0f} ms)"
+
+    info, calls, _ = run_scenario("stalled first attempt -> retry succeeds", MockWetest(latency_schedule=[1000]), UPSTREAM_TIMEOUT_MS="50", UPSTREAM_RETRIES="2")
+    assert info and calls == 2, (info, calls)
+
+if __name__ == "__main__":
+    main()
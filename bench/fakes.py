@@ -0,0 +1,331 @@
+"""Local stand-ins for the Workers runtime modules (`workers`, `pyodide.ffi`, `js`).
+
+`install()` registers them in `sys.modules` so `src/index.py` can be imported on plain CPython.
+Outbound `js.fetch` calls are routed by hostname to handlers registered with `route()`; every
+call is recorded in `CALLS` for call-count assertions. An `AbortSignal.timeout` passed to a fetch
+is honoured, so slow mock upstreams time out the way they would in the runtime. `caches.default`
+is an in-memory Cache API keyed by URL. Sockets opened
+through `cloudflare:sockets` connect() follow the per-address behaviour set with `socket_behaviour()`.
+`HTMLRewriter` handles the element selectors and methods the page shell uses.
+"""
+import asyncio, html, json, re, sys, types
+from urllib.parse import urlparse
+
+CALLS = []
+ROUTES = {}
+SOCKETS = {}
+CACHE = {}
+
+def route(hostname, handler):
+    """Registers `handler(method, url, headers, body)` -> FakeResponse for requests to `hostname`."""
+    ROUTES[hostname] = handler
+
+def socket_behaviour(hostname, latency_ms=1, reachable=True):
+    """Sets how a connect() to `hostname` behaves; unknown addresses open after 1 ms."""
+    SOCKETS[hostname] = (latency_ms, reachable)
+
+def reset():
+    CALLS.clear()
+    ROUTES.clear()
+    SOCKETS.clear()
+    CACHE.clear()
+
+def calls(method=None, path_prefix=None, hostname=None):
+    out = []
+    for call in CALLS:
+        parsed = urlparse(call["url"])
+        if method and call["method"] != method:
+            continue
+        if hostname and parsed.hostname != hostname:
+            continue
+        if path_prefix is not None and parsed.path != path_prefix and not parsed.path.startswith(path_prefix.rstrip("/") + "/"):
+            continue
+        out.append(call)
+    return out
+
+class FakeHeaders:
+    def __init__(self, init=None):
+        self._items = {}
+        for key, value in (init or {}).items():
+            self._items[key.lower()] = str(value)
+
+    @classmethod
+    def new(cls, init=None):
+        return cls(init)
+
+    def append(self, key, value):
+        self._items[key.lower()] = str(value)
+
+    set = append
+
+    def get(self, key):
+        return self._items.get(key.lower())
+
+    def items(self):
+        return self._items.items()
+
+class FakeResponse:
+    def __init__(self, body="", status=200, headers=None):
+        self.body = body
+        self.status = status
+        self.ok = 200 <= status < 300
+        self.headers = FakeHeaders(headers)
+
+    @classmethod
+    def new(cls, body="", init=None):
+        return cls(body, (init or {}).get("status", 200), (init or {}).get("headers"))
+
+    def clone(self):
+        return FakeResponse(self.body, self.status, dict(self.headers.items()))
+
+    async def text(self):
+        return self.body if isinstance(self.body, str) else self.body.decode("utf-8")
+
+    async def json(self):
+        import json
+        return json.loads(await self.text())
+
+async def fetch(url, init=None):
+    init = init or {}
+    method = init.get("method", "GET")
+    body = init.get("body")
+    headers = init.get("headers")
+    CALLS.append({"method": method, "url": url, "body": body})
+    handler = ROUTES.get(urlparse(url).hostname)
+    if handler is None:
+        raise RuntimeError(f"No fake route for {url}")
+    signal = init.get("signal")
+    if isinstance(signal, dict) and signal.get("timeout"):
+        try:
+            return await asyncio.wait_for(handler(method, url, headers, body), signal["timeout"] / 1000)
+        except asyncio.TimeoutError:
+            raise RuntimeError(f"The operation was aborted due to timeout ({url})") from None
+    return await handler(method, url, headers, body)
+
+class _Cache:
+    """Cache API stand-in: `match`/`put`/`delete` by URL, without expiry."""
+    async def match(self, key):
+        response = CACHE.get(str(key))
+        return response.clone() if response is not None else None
+
+    async def put(self, key, response):
+        CACHE[str(key)] = response.clone()
+
+    async def delete(self, key):
+        return CACHE.pop(str(key), None) is not None
+
+class _AbortSignal:
+    @staticmethod
+    def timeout(ms):
+        return {"timeout": ms}
+
+class _Object:
+    @staticmethod
+    def fromEntries(entries):
+        return dict(entries)
+
+class _TextEncoder:
+    @classmethod
+    def new(cls):
+        return cls()
+
+    def encode(self, text):
+        return text.encode("utf-8")
+
+class _StreamWriter:
+    def __init__(self, stream):
+        self.stream = stream
+        self.closed = False
+
+    async def write(self, chunk):
+        self.stream.chunks.append(chunk)
+
+    async def close(self):
+        self.closed = True
+        self.stream.done.set()
+
+class _TransformStream:
+    """Collects everything written to its writable side into `chunks`; `done` is set on close."""
+    def __init__(self):
+        self.chunks = []
+        self.done = asyncio.Event()
+        self.writable = types.SimpleNamespace(getWriter=lambda: _StreamWriter(self))
+        self.readable = self
+
+    @classmethod
+    def new(cls):
+        return cls()
+
+    def text(self):
+        return b"".join(self.chunks).decode("utf-8")
+
+class _Proxy:
+    def __init__(self, fn):
+        self.fn = fn
+
+    def __call__(self, *args, **kwargs):
+        return self.fn(*args, **kwargs)
+
+    def destroy(self):
+        pass
+
+class _Element:
+    """One start tag seen by `_HTMLRewriter`, with the element mutations it records."""
+    def __init__(self, name, attrs):
+        self.tagName = name
+        self.attrs = attrs
+        self.inner = None
+        self.appended = []
+
+    def getAttribute(self, name):
+        return self.attrs.get(name)
+
+    def setAttribute(self, name, value):
+        self.attrs[name] = str(value)
+
+    def setInnerContent(self, content, options=None):
+        self.inner = _content(content, options)
+
+    def append(self, content, options=None):
+        self.appended.append(_content(content, options))
+
+def _content(content, options):
+    return str(content) if (options or {}).get("html") else html.escape(str(content), quote=False)
+
+class _RewrittenBody:
+    def __init__(self, text):
+        self.text = text
+
+    async def pipeTo(self, writable):
+        writer = writable.getWriter()
+        await writer.write(self.text.encode("utf-8"))
+        await writer.close()
+
+class _HTMLRewriter:
+    """Element handlers for `tag`, `tag.class`, `tag[attr]` and `tag.class[attr]` selectors.
+
+    Good enough for the shell template: an element's content ends at the next closing tag of the
+    same name, so nested elements of one tag name are not supported.
+    """
+    SELECTOR = re.compile(r"^(\w+)(?:\.([\w-]+))?(?:\[([\w-]+)\])?$")
+
+    def __init__(self):
+        self.handlers = []
+
+    @classmethod
+    def new(cls):
+        return cls()
+
+    def on(self, selector, handlers):
+        self.handlers.append((self.SELECTOR.match(selector).groups(), handlers["element"]))
+        return self
+
+    def rewrite(self, text):
+        for (name, cls, attr), handler in self.handlers:
+            out, pos = [], 0
+            for match in re.finditer(rf"<{name}\b([^>]*)>", text):
+                attrs = {k: html.unescape(v) for k, v in re.findall(r'([\w-]+)="([^"]*)"', match.group(1))}
+                if match.start() < pos or (cls and cls not in attrs.get("class", "").split()) or (attr and attr not in attrs):
+                    continue
+                element = _Element(name, attrs)
+                handler(element)
+                close = text.index(f"</{name}>", match.end())
+                inner = text[match.end():close] if element.inner is None else element.inner
+                start = "".join(f' {k}="{html.escape(v)}"' for k, v in element.attrs.items())
+                out += [text[pos:match.start()], f"<{name}{start}>", inner, *element.appended]
+                pos = close
+            text = "".join(out) + text[pos:]
+        return text
+
+    def transform(self, response):
+        text = response.body if isinstance(response.body, str) else bytes(response.body).decode("utf-8")
+        return FakeResponse(_RewrittenBody(self.rewrite(text)), response.status, dict(response.headers.items()))
+
+class FakeSocket:
+    """A `cloudflare:sockets` Socket whose `opened` settles after the configured latency."""
+    def __init__(self, address, options=None):
+        self.address = address
+        latency_ms, reachable = SOCKETS.get(address["hostname"], (1, True))
+        self.opened = asyncio.ensure_future(self._open(latency_ms, reachable))
+        self.closed = False
+
+    async def _open(self, latency_ms, reachable):
+        await asyncio.sleep(latency_ms / 1000)
+        if not reachable:
+            raise ConnectionRefusedError(f"connect to {self.address['hostname']}:{self.address['port']} refused")
+        return {"remoteAddress": self.address["hostname"]}
+
+    def close(self):
+        self.closed = True
+        if not self.opened.done():
+            self.opened.cancel()
+
+def import_from_javascript(name):
+    if name == "cloudflare:sockets":
+        return types.SimpleNamespace(connect=FakeSocket)
+    raise ImportError(name)
+
+class WorkerEntrypoint:
+    def __init__(self, ctx=None, env=None):
+        self.ctx = ctx
+        self.env = env
+
+class Response:
+    def __init__(self, body=None, status=200, headers=None):
+        self.body = body
+        self.status = status
+        self.headers = FakeHeaders(headers)
+
+class FakeRequest:
+    """Incoming request as seen by `Default.fetch`: headers, a JSON body and `js_object.cf`."""
+    def __init__(self, url, method="GET", headers=None, body=None, cf=None):
+        self.url = url
+        self.method = method
+        self.headers = FakeHeaders(headers)
+        self.body = body
+        self.js_object = types.SimpleNamespace(cf=types.SimpleNamespace(**cf) if cf else None)
+
+    async def json(self):
+        return json.loads(self.body) if isinstance(self.body, str) else self.body
+
+async def read_body(response):
+    """The full body of a worker response as bytes, waiting for a streamed body to close."""
+    body = response.body
+    if isinstance(body, _TransformStream):
+        await body.done.wait()
+        return b"".join(body.chunks)
+    if body is None:
+        return b""
+    return body.encode("utf-8") if isinstance(body, str) else bytes(body)
+
+def install():
+    """Registers the fake runtime modules; safe to call more than once."""
+    if "js" in sys.modules and getattr(sys.modules["js"], "__fake__", False):
+        return
+    js = types.ModuleType("js")
+    js.__fake__ = True
+    js.fetch = fetch
+    js.Headers = FakeHeaders
+    js.AbortSignal = _AbortSignal
+    js.Object = _Object
+    js.TextEncoder = _TextEncoder
+    js.TransformStream = _TransformStream
+    js.HTMLRewriter = _HTMLRewriter
+    js.Response = FakeResponse
+    js.caches = types.SimpleNamespace(default=_Cache())
+
+    ffi = types.ModuleType("pyodide.ffi")
+    ffi.to_js = lambda obj, dict_converter=None, **kwargs: obj
+    ffi.create_proxy = _Proxy
+    pyodide = types.ModuleType("pyodide")
+    pyodide.ffi = ffi
+
+    workers = types.ModuleType("workers")
+    workers.WorkerEntrypoint = WorkerEntrypoint
+    workers.Response = Response
+    workers.import_from_javascript = import_from_javascript
+
+    sys.modules.update({"js": js, "pyodide": pyodide, "pyodide.ffi": ffi, "workers": workers})
+
+def run(coro):
+    return asyncio.run(coro)
@@ -0,0 +1,54 @@
+"""Shared fixture for the bench scripts: worker/engine factories and per-scenario isolate reset.
+
+Importing this module puts `bench/` and `src/` on the path and installs the fake runtime, so a
+script only needs `from harness import ...` before importing anything from `src/`.
+"""
+import os, sys
+from types import SimpleNamespace
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [p for p in (HERE, os.path.join(HERE, "..", "src")) if p not in sys.path]
+
+import fakes
+fakes.install()
+
+import index, sync
+from metrics import METRICS
+
+ZONE_ID = "zone-0001"
+HOSTNAME = "cdn.example.com."
+REGION_HOST = "dns.cn-east-3.myhuaweicloud.com"
+WETEST_HOST = "www.wetest.vip"
+LINES = {"CM": "Yidong", "CU": "Liantong", "CT": "Dianxin"}
+
+def make_worker(**overrides):
+    env = dict(DOMAIN_NAME="cdn.example.com", SUB_DOMAIN="@", HW_ZONE_ID=ZONE_ID, HW_AK="ak", HW_SK="sk", SYNC_TOKEN="t")
+    env.update(overrides)
+    return index.Default(ctx=None, env=SimpleNamespace(**env))
+
+def make_engine(**overrides):
+    return make_worker(**overrides).get_sync_engine()
+
+def reset_isolate(wetest=None, hw=None):
+    """Fresh isolate state: fake routes, caches, KV, the active run and METRICS; then routes the mocks."""
+    fakes.reset()
+    sync._LOCAL_STATE.data.clear()
+    sync._TOPOLOGY_CACHE.clear()
+    sync._TOPOLOGY_REFRESHING.clear()
+    sync._ACTIVE_SYNC.update(run=None, next=None)
+    METRICS.counters.clear()
+    METRICS.latency.clear()
+    METRICS.runs.clear()
+    METRICS.active = None
+    if wetest is not None:
+        fakes.route(WETEST_HOST, wetest)
+    if hw is not None:
+        fakes.route(REGION_HOST, hw)
+
+def seed_stale(hw):
+    """Every target line exists but holds outdated addresses."""
+    ids = []
+    for line in ("default_view", *LINES.values()):
+        ids.append(hw.add(HOSTNAME, "A", line, ["192.0.2.1"]))
+        ids.append(hw.add(HOSTNAME, "AAAA", line, ["2001:db8:ffff::1"]))
+    return ids
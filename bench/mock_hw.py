@@ -0,0 +1,111 @@
+"""In-memory mock of the Huawei Cloud DNS v2.1 endpoints used by the sync engine."""
+import asyncio, itertools, json, random
+from urllib.parse import parse_qs, urlparse
+
+from fakes import FakeResponse
+
+SYSTEM_LINES = [
+    {"id": "Yidong", "name": "移动"},
+    {"id": "Liantong", "name": "联通"},
+    {"id": "Dianxin", "name": "电信"},
+    {"id": "Jiaoyuwang", "name": "教育网"},
+]
+
+class MockHuaweiDns:
+    """Holds recordsets for one zone and answers signed requests against them.
+
+    `batch_enabled=False` makes both batch endpoints reject every call; ids in `batch_reject_ids`
+    are silently left out of an otherwise successful batch response. Every call waits `latency_ms`
+    and fails with HTTP 500 with probability `error_rate` (seeded, so runs are repeatable).
+    """
+    def __init__(self, zone_id, batch_enabled=True, batch_reject_ids=(), latency_ms=0, error_rate=0.0, seed=0):
+        self.zone_id = zone_id
+        self.recordsets = {}
+        self.batch_enabled = batch_enabled
+        self.batch_reject_ids = set(batch_reject_ids)
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self._ids = itertools.count(1)
+
+    def add(self, name, rtype, line, records, ttl=600):
+        rec_id = f"rs{next(self._ids):04d}"
+        self.recordsets[rec_id] = {"id": rec_id, "name": name, "type": rtype, "line": line, "ttl": ttl, "records": list(records)}
+        return rec_id
+
+    def find(self, name, rtype, line):
+        return [r for r in self.recordsets.values() if r["name"] == name and r["type"] == rtype and r["line"] == line]
+
+    def state(self):
+        return {(r["type"], r["line"]): sorted(r["records"]) for r in self.recordsets.values()}
+
+    @staticmethod
+    def reply(payload, status=200):
+        return FakeResponse(json.dumps(payload), status)
+
+    async def __call__(self, method, url, headers, body):
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        if self.error_rate and self.rng.random() < self.error_rate:
+            return self.reply({"code": "DNS.0001", "message": "Internal error"}, 500)
+        parsed = urlparse(url)
+        parts = [p for p in parsed.path.split("/") if p]
+        payload = json.loads(body) if body else {}
+
+        if parts == ["v2.1", "system-lines"]:
+            return self.reply({"lines": SYSTEM_LINES})
+        if parts[:3] != ["v2.1", "zones", self.zone_id] or len(parts) < 4 or parts[3] != "recordsets":
+            return self.reply({"code": "DNS.0101", "message": "Not found"}, 404)
+
+        if len(parts) == 4:
+            if method == "GET":
+                return self.list(parse_qs(parsed.query))
+            if method == "POST":
+                return self.create(payload)
+            if method == "PUT":
+                return self.batch(payload.get("recordsets", []), self.update_one)
+            if method == "DELETE":
+                return self.batch([{"id": rid} for rid in payload.get("recordset_ids", [])], lambda item: self.recordsets.pop(item["id"], None))
+
+        rec = self.recordsets.get(parts[4])
+        if rec is None:
+            return self.reply({"code": "DNS.0312", "message": "Record set not found"}, 404)
+        if method == "PUT":
+            return self.reply(self.update_one(dict(payload, id=rec["id"])))
+        if method == "DELETE":
+            return self.reply(self.recordsets.pop(rec["id"]), 202)
+        return self.reply({"message": "Method not allowed"}, 405)
+
+    def list(self, query):
+        name = query.get("name", [""])[0]
+        exact = query.get("search_mode", ["like"])[0] == "equal"
+        matched = [r for r in self.recordsets.values() if (r["name"] == name if exact else name in r["name"])]
+        offset = int(query.get("offset", ["0"])[0])
+        limit = int(query.get("limit", ["500"])[0])
+        return self.reply({"recordsets": matched[offset:offset + limit], "metadata": {"total_count": len(matched)}})
+
+    def create(self, payload):
+        if self.find(payload["name"], payload["type"], payload.get("line", "default_view")):
+            return self.reply({"code": "DNS.0312", "message": "Record set exists"}, 400)
+        rec_id = self.add(payload["name"], payload["type"], payload.get("line", "default_view"), payload["records"], payload.get("ttl", 300))
+        return self.reply(self.recordsets[rec_id], 202)
+
+    def update_one(self, item):
+        rec = self.recordsets.get(item["id"])
+        if rec is None:
+            return None
+        rec["records"] = list(item.get("records", rec["records"]))
+        rec["ttl"] = item.get("ttl", rec["ttl"])
+        return rec
+
+    def batch(self, items, apply):
+        if not self.batch_enabled:
+            return self.reply({"code": "DNS.0003", "message": "Batch operation not supported"}, 400)
+        done = []
+        for item in items:
+            if item["id"] in self.batch_reject_ids:
+                continue
+            result = apply(item)
+            if result is not None:
+                done.append(result)
+        return self.reply({"recordsets": done}, 202)
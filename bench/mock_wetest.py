@@ -0,0 +1,41 @@
+"""Mock of the wetest.vip cf2dns endpoint with configurable latency and failure rate."""
+import asyncio, json, random
+
+from fakes import FakeResponse
+
+CARRIERS = ("CM", "CU", "CT", "CN")
+
+def wetest_payload(family, per_carrier=3, shift=0):
+    """Deterministic pick lists per carrier; `shift` rotates the addresses to simulate churn."""
+    def item(ip, n):
+        return {"ip": ip, "latency": 100 + n * 10, "loss": "0.00", "speed": 2000}
+    if family == "v4":
+        return {code: [item(f"198.51.100.{i * 10 + (n + shift) % 10}", n) for n in range(per_carrier)] for i, code in enumerate(CARRIERS)}
+    return {code: [item(f"2001:db8::{i * 10 + (n + shift) % 10:x}", n) for n in range(per_carrier)] for i, code in enumerate(CARRIERS)}
+
+class MockWetest:
+    """Answers `get_cloudflare_ip?type=v4|v6`.
+
+    Each call waits `latency_ms` plus up to `jitter_ms`, then fails with HTTP 503 with probability
+    `error_rate`. Randomness comes from a seeded generator so runs are repeatable. The n-th call
+    waits `latency_schedule[n]` instead of `latency_ms` while the schedule lasts, e.g. to stall
+    only the first request.
+    """
+    def __init__(self, latency_ms=0, jitter_ms=0, error_rate=0.0, seed=0, per_carrier=3, latency_schedule=()):
+        self.latency_ms = latency_ms
+        self.latency_schedule = list(latency_schedule)
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.per_carrier = per_carrier
+        self.shift = 0
+        self.rng = random.Random(seed)
+
+    async def __call__(self, method, url, headers, body):
+        base = self.latency_schedule.pop(0) if self.latency_schedule else self.latency_ms
+        delay = base + (self.rng.uniform(0, self.jitter_ms) if self.jitter_ms else 0)
+        if delay:
+            await asyncio.sleep(delay / 1000)
+        if self.error_rate and self.rng.random() < self.error_rate:
+            return FakeResponse(json.dumps({"status": False, "code": 503, "msg": "Service Unavailable"}), 503)
+        family = "v6" if url.endswith("type=v6") else "v4"
+        return FakeResponse(json.dumps({"status": True, "code": 200, "info": wetest_payload(family, self.per_carrier, self.shift)}))
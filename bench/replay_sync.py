@@ -0,0 +1,174 @@
+"""Offline replay of reconciliation over a history of upstream payloads.
+
+Run from the repository root:
+
+    python bench/replay_sync.py [--corpus FILE | --days N] [--state FILE] [--env KEY=VALUE ...]
+
+The corpus is JSON lines, one tick per line: {"ts": epoch seconds (optional), "v4": info,
+"v6": info}, where `info` is the wetest.vip `info` object. Without --corpus a synthetic corpus
+of --days days is generated; --write-corpus saves it for later runs. --state is a JSON list of
+{"type", "line", "records", "ttl"} recordsets present before the first tick.
+
+Each tick runs the engine's real `sync_target` (selection, hysteresis, fingerprint skip, planning,
+batched writes) against an in-process MockHuaweiDns, on a simulated clock, without HTTP or
+signing. Reports API calls by kind, record rewrites, IP churn per line and the CPU time spent
+modeling and planning. --env overrides engine settings (SELECTION_MARGIN_PCT, HW_BATCH_WRITES...)
+so two runs over the same corpus compare a change.
+"""
+import argparse, json, random, statistics, time
+
+from harness import HOSTNAME, ZONE_ID, make_worker, reset_isolate
+import fakes
+import sync
+from mock_hw import SYSTEM_LINES, MockHuaweiDns
+from mock_wetest import CARRIERS
+
+TICK_SECONDS = 900
+START_TS = 1767225600 # 2026-01-01T00:00:00Z
+
+class SimClock:
+    """Stands in for the `time` module inside sync.py so ages and staleness follow the corpus."""
+    def __init__(self, now):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+class ReplayEngine(sync.SyncEngine):
+    """SyncEngine whose HW API calls go straight to an in-memory model, counted by kind."""
+    def __init__(self, worker, model):
+        super().__init__(worker)
+        self.model = model
+        self.calls = {}
+        self.cpu = {"model": 0.0, "plan": 0.0}
+
+    async def hw_fetch(self, hw, method, path, query="", body=None):
+        kind = "list" if method == "GET" else f"{method} {'batch' if path == hw.recordsets_path and method != 'POST' else 'single'}"
+        self.calls[kind] = self.calls.get(kind, 0) + 1
+        response = await self.model(method, f"https://replay{path}" + (f"?{query}" if query else ""), None, body)
+        return response.status, await response.text()
+
+    def model_targets(self, *args, **kwargs):
+        started = time.process_time()
+        try:
+            return super().model_targets(*args, **kwargs)
+        finally:
+            self.cpu["model"] += time.process_time() - started
+
+def timed_plan(engine, plan):
+    def wrapper(*args, **kwargs):
+        started = time.process_time()
+        try:
+            return plan(*args, **kwargs)
+        finally:
+            engine.cpu["plan"] += time.process_time() - started
+    return wrapper
+
+def synthetic_corpus(days, seed=0, pool=16, listed=10, replace_rate=0.001, noise_ms=4.0):
+    """Per carrier and family, a pool of IPs whose latency drifts (AR(1) noise around a base) and
+    which are occasionally replaced by fresh addresses; each tick lists the `listed` fastest."""
+    rng = random.Random(seed)
+    serial = iter(range(1, 1 << 20))
+
+    def new_ip(family, code):
+        n = next(serial)
+        return f"198.{18 + CARRIERS.index(code)}.{n >> 8 & 255}.{n & 255}" if family == "v4" else f"2001:db8:{CARRIERS.index(code):x}::{n:x}"
+
+    pools = {(family, code): {new_ip(family, code): [rng.uniform(80, 200), 0.0] for _ in range(pool)} for family in ("v4", "v6") for code in CARRIERS[:3]}
+    ticks = []
+    for tick in range(int(days * 86400 / TICK_SECONDS)):
+        entry = {"ts": START_TS + tick * TICK_SECONDS, "v4": {}, "v6": {}}
+        for (family, code), ips in pools.items():
+            for ip in list(ips):
+                if rng.random() < replace_rate:
+                    del ips[ip]
+                    ips[new_ip(family, code)] = [rng.uniform(80, 200), 0.0]
+            for state in ips.values():
+                state[1] = 0.8 * state[1] + rng.gauss(0, noise_ms)
+            ranked = sorted(ips, key=lambda ip: ips[ip][0] + ips[ip][1])[:listed]
+            entry[family][code] = [{"ip": ip, "latency": round(max(1.0, ips[ip][0] + ips[ip][1])), "loss": "0.00", "speed": 2000} for ip in ranked]
+        ticks.append(entry)
+    return ticks
+
+def load_corpus(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def seed_model(model, state_path):
+    if not state_path:
+        return
+    with open(state_path, encoding="utf-8") as f:
+        for rec in json.load(f):
+            model.add(HOSTNAME, rec["type"], rec.get("line") or "default_view", rec["records"], rec.get("ttl", sync.DEFAULT_RECORD_TTL))
+
+async def replay(corpus, args, env):
+    model = MockHuaweiDns(ZONE_ID)
+    seed_model(model, args.state)
+    engine = ReplayEngine(make_worker(LOG_LEVEL="FATAL", **env), model)
+    clock = SimClock(corpus[0].get("ts") or START_TS)
+    real_time, real_plan = sync.time, sync.plan_reconciliation
+    sync.time, sync.plan_reconciliation = clock, timed_plan(engine, real_plan)
+    reset_isolate()
+
+    hw = type("ReplayZone", (), {"recordsets_path": f"/v2.1/zones/{ZONE_ID}/recordsets"})()
+    target = {"hostname": HOSTNAME, "zone_id": ZONE_ID, "max_ips": args.max_ips, "ttl": args.ttl}
+    line_map = sync.build_line_map(SYSTEM_LINES)
+    outcomes, rewrites, churn, changes = {}, 0, {}, {}
+    try:
+        for n, tick in enumerate(corpus):
+            clock.now = tick.get("ts") or START_TS + n * TICK_SECONDS
+            before = model.state()
+            outcome = await engine.sync_target(hw, target, (tick.get("v4") or {}, tick.get("v6") or {}, line_map, {}))
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+            after = model.state()
+            for key in before.keys() | after.keys():
+                moved = len(set(before.get(key, ())) ^ set(after.get(key, ())))
+                if key in before and key in after and moved == 0 and before[key] == after[key]:
+                    continue
+                rewrites += 1
+                churn[key] = churn.get(key, 0) + moved
+                changes[key] = changes.get(key, 0) + 1
+    finally:
+        sync.time, sync.plan_reconciliation = real_time, real_plan
+    return engine, outcomes, rewrites, churn, changes
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus")
+    parser.add_argument("--days", type=float, default=90)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--write-corpus")
+    parser.add_argument("--state")
+    parser.add_argument("--max-ips", type=int, default=sync.MAX_IPS_PER_RECORD)
+    parser.add_argument("--ttl", type=int, default=sync.DEFAULT_RECORD_TTL)
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE")
+    args = parser.parse_args()
+    env = dict(item.split("=", 1) for item in args.env)
+
+    corpus = load_corpus(args.corpus) if args.corpus else synthetic_corpus(args.days, args.seed)
+    if args.write_corpus:
+        with open(args.write_corpus, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(tick, separators=(",", ":")) + "\n" for tick in corpus)
+
+    started = time.perf_counter()
+    engine, outcomes, rewrites, churn, changes = fakes.run(replay(corpus, args, env))
+    wall = time.perf_counter() - started
+
+    span_days = len(corpus) * TICK_SECONDS / 86400
+    print(f"replayed {len(corpus)} ticks ({span_days:.1f} days) in {wall:.2f} s ({len(corpus) / wall:,.0f} ticks/s)")
+    print(f"outcomes      {', '.join(f'{k}={v}' for k, v in sorted(outcomes.items()))}")
+    print(f"api calls     {sum(engine.calls.values())} total: {', '.join(f'{k}={v}' for k, v in sorted(engine.calls.items()))}")
+    print(f"rewrites      {rewrites} recordset change(s), {rewrites / max(span_days, 1e-9):.1f}/day")
+    print(f"planning cpu  model {engine.cpu['model'] * 1000:.1f} ms, plan {engine.cpu['plan'] * 1000:.1f} ms "
+          f"({(engine.cpu['model'] + engine.cpu['plan']) * 1e6 / len(corpus):.0f} us/tick)")
+    print(f"{'record':<22}{'changes':>10}{'ips moved':>12}{'ips/day':>10}")
+    for key in sorted(churn):
+        print(f"{key[0] + ' (' + key[1] + ')':<22}{changes[key]:>10}{churn[key]:>12}{churn[key] / max(span_days, 1e-9):>10.1f}")
+    if churn:
+        print(f"{'median per record':<22}{statistics.median(changes.values()):>10.0f}{statistics.median(churn.values()):>12.0f}")
+
+if __name__ == "__main__":
+    main()
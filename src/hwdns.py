@@ -0,0 +1,84 @@
+"""Huawei Cloud DNS API client with a reusable request-signing context.
+
+One client is kept per isolate and credential set. Everything that does not depend on the
+individual request (host, canonical header prefix, Authorization prefix and the keyed HMAC state)
+is computed once in the constructor, so signing a request only hashes what actually varies.
+"""
+import copy, hashlib, hmac, time
+from functools import lru_cache
+from urllib.parse import quote
+
+SIGNING_ALGORITHM = "SDK-HMAC-SHA256"
+SIGNED_HEADERS = "content-type;host;x-sdk-date"
+EMPTY_PAYLOAD_HASH = hashlib.sha256(b"").hexdigest()
+
+_CLIENTS = {}
+
+@lru_cache(maxsize=128)
+def canonical_query(query):
+    if not query:
+        return ""
+    pairs = [f"{quote(k, safe='~')}={quote(v, safe='~')}" for param in query.split('&') for k, v in [param.split('=', 1) if '=' in param else (param, "")]]
+    pairs.sort()
+    return '&'.join(pairs)
+
+class HuaweiDnsClient:
+    def __init__(self, ak, sk, region, zone_id):
+        self.region = region
+        self.zone_id = zone_id
+        self.host = f"dns.{region}.myhuaweicloud.com"
+        self.base_url = f"https://{self.host}"
+        self.recordsets_path = f"/v2.1/zones/{zone_id}/recordsets"
+        self._mac = hmac.new(sk.encode('utf-8'), digestmod=hashlib.sha256)
+        self._header_prefix = f"content-type:application/json\nhost:{self.host}\nx-sdk-date:"
+        self._auth_prefix = f"{SIGNING_ALGORITHM} Access={ak}, SignedHeaders={SIGNED_HEADERS}, Signature="
+        self._date_second = None
+        self._sdk_date = ""
+
+    def for_zone(self, zone_id):
+        """A client for another zone that shares this client's signing context."""
+        if zone_id == self.zone_id:
+            return self
+        other = copy.copy(self)
+        other.zone_id = zone_id
+        other.recordsets_path = f"/v2.1/zones/{zone_id}/recordsets"
+        return other
+
+    def sign(self, method, path, query="", body=b"", sdk_date=None):
+        """Returns the signed request headers for `path` (no host) and the encoded `body`."""
+        uri = path if path.endswith('/') else path + '/'
+        if sdk_date is None:
+            second = int(time.time())
+            if second != self._date_second:
+                self._date_second, self._sdk_date = second, time.strftime('%Y%m%dT%H%M%SZ', time.gmtime(second))
+            sdk_date = self._sdk_date
+        payload_hash = hashlib.sha256(body).hexdigest() if body else EMPTY_PAYLOAD_HASH
+        canonical_request = f"{method}\n{uri}\n{canonical_query(query)}\n{self._header_prefix}{sdk_date}\n\n{SIGNED_HEADERS}\n{payload_hash}"
+        string_to_sign = f"{SIGNING_ALGORITHM}\n{sdk_date}\n{hashlib.sha256(canonical_request.encode('utf-8')).hexdigest()}"
+        mac = self._mac.copy()
+        mac.update(string_to_sign.encode('utf-8'))
+        return {
+            "Content-Type": "application/json",
+            "X-Sdk-Date": sdk_date,
+            "Host": self.host,
+            "Authorization": self._auth_prefix + mac.hexdigest(),
+        }
+
+    def url(self, path, query=""):
+        return f"{self.base_url}{path}?{query}" if query else f"{self.base_url}{path}"
+
+    def request_init(self, method, path, query="", body=None):
+        """Signed fetch options for a request whose body is already serialized to a JSON string."""
+        encoded = body.encode('utf-8') if body else b""
+        init = {"method": method, "headers": self.sign(method, path, query, encoded)}
+        if body:
+            init["body"] = body
+        return init
+
+def get_client(ak, sk, region, zone_id):
+    """Per-isolate client for the credential set, created on first use."""
+    key = (ak, sk, region, zone_id)
+    client = _CLIENTS.get(key)
+    if client is None:
+        client = _CLIENTS[key] = HuaweiDnsClient(ak, sk, region, zone_id)
+    return client
@@ -0,0 +1,104 @@
+"""Structured log records and buffered sinks for the streamed sync log.
+
+A log call produces a small record dict. Records are only rendered (plain text or NDJSON) when a
+sink flushes, and sinks batch many records into one stream chunk, flushed once the buffer passes a
+size threshold, after a short delay, at phase boundaries and on close.
+"""
+import asyncio, json
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARN": 30, "ERROR": 40, "FATAL": 50}
+DEFAULT_FLUSH_BYTES = 4096
+DEFAULT_FLUSH_MS = 250
+
+# Fields merged into every record made in the current task, e.g. {"target": hostname}.
+LOG_CONTEXT = ContextVar("log_context", default={})
+
+def level_value(level, default="INFO"):
+    return LEVELS.get(str(level).upper(), LEVELS[default])
+
+def make_record(level, module, message, **fields):
+    record = {"ts": datetime.now(timezone.utc).timestamp(), "level": level, "module": module, "msg": message}
+    context = LOG_CONTEXT.get()
+    if context:
+        record.update(context)
+    if fields:
+        record.update(fields)
+    return record
+
+def format_text(record):
+    timestamp = datetime.fromtimestamp(record["ts"], timezone.utc).isoformat()
+    target = f"({record['target']}) " if record.get("target") else ""
+    return f"[{timestamp}] [{record['level']}] [{record['module']}] {target}{record['msg']}"
+
+def format_ndjson(record):
+    out = dict(record)
+    out["ts"] = datetime.fromtimestamp(record["ts"], timezone.utc).isoformat()
+    return json.dumps(out, ensure_ascii=False, separators=(",", ":"))
+
+class LogSink:
+    """Buffers records for one stream writer and renders them in batches.
+
+    `fmt` is "text" or "ndjson"; records below `level` are dropped before any formatting.
+    """
+    def __init__(self, writer, encoder, level="INFO", fmt="text", flush_bytes=DEFAULT_FLUSH_BYTES, flush_ms=DEFAULT_FLUSH_MS):
+        self.writer = writer
+        self.encoder = encoder
+        self.threshold = level_value(level)
+        self.render = format_ndjson if fmt == "ndjson" else format_text
+        self.flush_bytes = flush_bytes
+        self.flush_ms = flush_ms
+        self.lines = []
+        self.pending_bytes = 0
+        self.timer = None
+        self.failed = False
+
+    async def emit(self, record):
+        if self.failed or LEVELS.get(record["level"], 0) < self.threshold:
+            return
+        line = self.render(record)
+        self.lines.append(line)
+        self.pending_bytes += len(line) + 1
+        if self.pending_bytes >= self.flush_bytes:
+            await self.flush()
+        elif self.timer is None and self.flush_ms > 0:
+            self.timer = asyncio.ensure_future(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_ms / 1000)
+        self.timer = None
+        await self.flush()
+
+    async def flush(self):
+        if self.timer is not None and self.timer is not asyncio.current_task():
+            self.timer.cancel()
+            self.timer = None
+        if not self.lines:
+            return
+        chunk = "\n".join(self.lines) + "\n"
+        self.lines, self.pending_bytes = [], 0
+        try:
+            await self.writer.write(self.encoder.encode(chunk))
+        except Exception:
+            self.failed = True # Client disconnected; stop rendering for it
+
+    async def close(self):
+        await self.flush()
+        try:
+            await self.writer.close()
+        except Exception:
+            pass
+
+class LogGroup:
+    """Holds back one operation's records until it settles, then emits them contiguously."""
+    def __init__(self):
+        self.records = []
+
+    async def emit(self, record):
+        self.records.append(record)
+
+    async def flush(self, sink):
+        records, self.records = self.records, []
+        for record in records:
+            await sink.emit(record)
@@ -0,0 +1,150 @@
+"""Per-isolate sync metrics: phase spans, outbound call stats, recent runs and counters.
+
+Everything lives in isolate memory, so numbers reset when the isolate is evicted and each isolate
+reports only the work it did itself.
+"""
+import time
+from collections import deque
+from contextlib import contextmanager
+
+RUN_HISTORY = 20
+METRIC_PREFIX = "cdn_sync"
+
+def _label_value(value):
+    """A Prometheus label value, escaped for the text exposition format."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _ms(seconds):
+    return round(seconds * 1000, 1)
+
+class Timing:
+    """Named durations for one request, rendered as a Server-Timing header value."""
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = []
+
+    @contextmanager
+    def span(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spans.append((name, _ms(time.perf_counter() - started)))
+
+    def header(self):
+        parts = [f"{name};dur={ms}" for name, ms in self.spans]
+        parts.append(f"total;dur={_ms(time.perf_counter() - self.started)}")
+        return ", ".join(parts)
+
+class RunTrace:
+    """Phase spans and outbound calls of one sync run."""
+    def __init__(self, trigger, mode):
+        self.trigger = trigger
+        self.mode = mode
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.phase = None
+        self.phase_started = self.started
+        self.phases = []
+        self.fetches = []
+        self.outcome = None
+        self.duration_ms = None
+
+    def enter(self, phase):
+        now = time.perf_counter()
+        if self.phase is not None:
+            self.phases.append({"phase": self.phase, "ms": _ms(now - self.phase_started)})
+        self.phase, self.phase_started = phase, now
+
+    def finish(self, outcome):
+        self.enter(None)
+        self.outcome = outcome
+        self.duration_ms = _ms(time.perf_counter() - self.started)
+
+    def summary(self):
+        return ", ".join(f"{span['phase']} {span['ms']} ms" for span in self.phases)
+
+    def to_dict(self):
+        return {
+            "trigger": self.trigger,
+            "mode": self.mode,
+            "started_at": self.started_at,
+            "outcome": self.outcome,
+            "duration_ms": self.duration_ms,
+            "phases": self.phases,
+            "fetches": self.fetches,
+        }
+
+class SyncMetrics:
+    """Cumulative counters, outbound latency aggregates and the last RUN_HISTORY run traces."""
+    def __init__(self, history=RUN_HISTORY):
+        self.counters = {}
+        self.latency = {}
+        self.runs = deque(maxlen=history)
+        self.active = None
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + amount
+
+    def start_run(self, trigger, mode):
+        self.active = RunTrace(trigger, mode)
+        return self.active
+
+    def finish_run(self, trace, outcome):
+        trace.finish(outcome)
+        self.inc("runs_total", trigger=trace.trigger, outcome=outcome)
+        self.runs.append(trace)
+        if self.active is trace:
+            self.active = None
+
+    def record_fetch(self, host, method, status, nbytes, ms):
+        """Records one outbound request; `status` is the HTTP status or "error" if none arrived."""
+        self.inc("outbound_requests_total", host=host, method=method, status=str(status))
+        if status == "error" or status >= 400:
+            self.inc("outbound_failures_total", host=host, method=method)
+        self.inc("outbound_response_bytes_total", nbytes, host=host)
+        agg = self.latency.setdefault(host, {"count": 0, "sum_ms": 0.0, "max_ms": 0.0})
+        agg["count"] += 1
+        agg["sum_ms"] += ms
+        agg["max_ms"] = max(agg["max_ms"], ms)
+        if self.active is not None:
+            self.active.fetches.append({"host": host, "method": method, "status": status, "bytes": nbytes, "ms": ms, "phase": self.active.phase})
+
+    def to_json(self):
+        return {
+            "counters": [{"name": f"{METRIC_PREFIX}_{name}", "labels": dict(labels), "value": value} for (name, labels), value in sorted(self.counters.items())],
+            "outbound_latency_ms": {host: {"count": agg["count"], "avg": round(agg["sum_ms"] / agg["count"], 1), "max": agg["max_ms"]} for host, agg in self.latency.items()},
+            "active_run": self.active.to_dict() if self.active else None,
+            "runs": [trace.to_dict() for trace in reversed(self.runs)],
+        }
+
+    def to_prometheus(self):
+        lines = []
+        typed = set()
+
+        def sample(name, kind, labels, value, family=None):
+            family = f"{METRIC_PREFIX}_{family or name}"
+            if family not in typed:
+                typed.add(family)
+                lines.append(f"# TYPE {family} {kind}")
+            metric = f"{METRIC_PREFIX}_{name}"
+            rendered = ",".join(f'{k}="{_label_value(v)}"' for k, v in labels)
+            lines.append(f"{metric}{{{rendered}}} {value}" if rendered else f"{metric} {value}")
+
+        for (name, labels), value in sorted(self.counters.items()):
+            sample(name, "counter", labels, value)
+        for host, agg in sorted(self.latency.items()):
+            sample("outbound_duration_ms_sum", "summary", (("host", host),), round(agg["sum_ms"], 1), family="outbound_duration_ms")
+            sample("outbound_duration_ms_count", "summary", (("host", host),), agg["count"], family="outbound_duration_ms")
+        for host, agg in sorted(self.latency.items()):
+            sample("outbound_duration_ms_max", "gauge", (("host", host),), round(agg["max_ms"], 1))
+        if self.runs:
+            last = self.runs[-1]
+            sample("last_run_timestamp_seconds", "gauge", (), round(last.started_at, 3))
+            sample("last_run_duration_ms", "gauge", (("outcome", last.outcome),), last.duration_ms)
+            for span in last.phases:
+                sample("last_run_phase_duration_ms", "gauge", (("phase", span["phase"]),), span["ms"])
+        return "\n".join(lines) + "\n"
+
+METRICS = SyncMetrics()
@@ -0,0 +1,406 @@
+"""Landing page rendering and static assets.
+
+The page template is compiled once at import time into a flat list of static segments and
+placeholder slots, so rendering a request is a single join instead of a chain of full-copy
+`str.replace` passes. Stylesheet and script are served separately under content-hashed paths.
+"""
+import hashlib, html, json, re
+from functools import lru_cache
+
+PLACEHOLDER_RE = re.compile(r"\$\{([^}]+)\}")
+
+class CompiledTemplate:
+    """A `${name}` template split into static segments (even indexes) and slot names (odd indexes)."""
+    def __init__(self, source):
+        self.source = source
+        self.segments = PLACEHOLDER_RE.split(source)
+        self.slots = [(i, self.segments[i]) for i in range(1, len(self.segments), 2)]
+        self.names = frozenset(name for _, name in self.slots)
+
+    def render(self, values):
+        out = self.segments.copy()
+        for i, name in self.slots:
+            out[i] = values[name]
+        return "".join(out)
+
+    def bind(self, values):
+        """Returns a template with the given slots folded into its static segments."""
+        passthrough = {name: "${%s}" % name for name in self.names}
+        return CompiledTemplate(self.render({**passthrough, **values}))
+
+class StaticAsset:
+    """Content-addressed asset, served under a hashed path so it can be cached as immutable."""
+    def __init__(self, name, ext, body, content_type):
+        digest = hashlib.sha256(body.encode("utf-8")).hexdigest()
+        self.body = body
+        self.content_type = content_type
+        self.path = f"/assets/{name}.{digest[:16]}.{ext}"
+        self.etag = f'"{digest[:32]}"'
+
+APP_CSS = """
+        body, html { margin: 0; padding: 0; height: 100%; width: 100%; background: #0d0d0d; font-family: 'Consolas', 'Monaco', 'Microsoft YaHei', sans-serif; display: flex; justify-content: center; align-items: center; overflow: hidden; }
+        .bg-overlay { position: fixed; top: 0; left: 0; right: 0; bottom: 0; width: 100%; height: 100%; object-fit: cover; z-index: 0; opacity: 0; transition: opacity 1.5s cubic-bezier(0.19, 1, 0.22, 1); }
+        .bg-overlay.loaded { opacity: 1; }
+        .bg-dimmer { position: fixed; top: 0; left: 0; right: 0; bottom: 0; background: rgba(0, 0, 0, 0.65); z-index: 1; }
+        .glass-container { position: relative; z-index: 10; background: rgba(20, 20, 20, 0.55); backdrop-filter: blur(25px) saturate(120%); -webkit-backdrop-filter: blur(25px) saturate(120%); border: 1px solid rgba(255, 255, 255, 0.15); border-radius: 8px; padding: 25px; color: #d0d0d0; width: 85%; max-width: 400px; box-shadow: 0 20px 40px rgba(0, 0, 0, 0.7); }
+        .terminal-header { border-bottom: 1px solid rgba(255, 255, 255, 0.1); padding-bottom: 12px; margin-bottom: 15px; display: flex; justify-content: space-between; align-items: center; }
+        .header-left { display: flex; align-items: center; gap: 10px; flex: 1; min-width: 0; margin-right: 10px; }
+        .header-right { display: flex; align-items: center; gap: 8px; flex-shrink: 0; }
+        h1 { font-size: 1.1rem; margin: 0; color: #fff; font-family: 'Consolas', monospace; white-space: nowrap; overflow: hidden; text-overflow: ellipsis; max-width: 100%; }
+        .badge { color: #00ff88; padding: 2px 8px; border-radius: 3px; font-size: 0.7rem; border: 1px solid #00ff88; font-weight: bold; margin-left: 5px;}
+        .action-btn { background: rgba(255, 255, 255, 0.1); border: 1px solid rgba(255, 255, 255, 0.2); color: #fff; width: 28px; height: 28px; border-radius: 6px; cursor: pointer; transition: all 0.3s ease; display: flex; justify-content: center; align-items: center; }
+        .action-btn:hover { background: rgba(255, 255, 255, 0.25); transform: translateY(-2px); box-shadow: 0 5px 10px rgba(0,0,0,0.3); }
+        .tech-desc { font-size: 0.8rem; line-height: 1.5; margin-bottom: 15px; color: #999; background: rgba(0, 0, 0, 0.25); padding: 12px; border-left: 2px solid #555; }
+        .info-grid { display: grid; gap: 8px; }
+        .info-item { display: flex; justify-content: space-between; align-items: flex-start; font-size: 0.8rem; padding: 4px 0; border-bottom: 1px solid rgba(255,255,255,0.05); }
+        .info-item .key { color: #666; flex-shrink: 0; width: 85px; padding-top: 2px; }
+        .info-item .val { color: #00d2ff; font-weight: bold; text-align: right; word-break: break-all; white-space: normal; line-height: 1.3; flex-grow: 1; }
+        .footer { margin-top: 25px; text-align: center; font-size: 0.7rem; color: #555; }
+        .footer a { color: #ff758c; text-decoration: none; font-weight: bold; transition: all 0.3s ease; }
+        .footer a:hover { color: #ff1493; text-shadow: 0 0 10px rgba(255, 20, 147, 0.8); }
+        .footer a.cf-link { color: #F38020; }
+        .footer a.cf-link:hover { color: #FF9933; text-shadow: 0 0 10px rgba(243, 128, 32, 0.8); }
+        #l2d-canvas { position: fixed; bottom: -10px; left: -15px; z-index: 999999 !important; pointer-events: none; }
+        
+        .music-player { position: fixed; bottom: 30px; right: 30px; background: rgba(20, 20, 20, 0.6); backdrop-filter: blur(15px); -webkit-backdrop-filter: blur(15px); border: 1px solid rgba(255, 255, 255, 0.15); border-radius: 50px; padding: 6px 16px 6px 6px; display: flex; align-items: center; gap: 10px; z-index: 100; box-shadow: 0 10px 25px rgba(0,0,0,0.5); transition: all 0.4s cubic-bezier(0.175, 0.885, 0.32, 1.275); opacity: 0; visibility: hidden; }
+        .music-player.active { opacity: 1; visibility: visible; }
+        .hide-player .music-player { display: none !important; }
+        
+        .cover-art { width: 42px; height: 42px; border-radius: 50%; object-fit: cover; animation: spin 6s linear infinite; animation-play-state: paused; border: 2px solid rgba(255, 255, 255, 0.1); }
+        .cover-art.playing { animation-play-state: running; }
+        @keyframes spin { 100% { transform: rotate(360deg); } }
+        
+        .track-info { display: flex; flex-direction: column; justify-content: center; width: 100px; }
+        .track-title { color: #fff; font-size: 0.8rem; font-weight: bold; white-space: nowrap; overflow: hidden; text-overflow: ellipsis; }
+        .track-artist { color: #888; font-size: 0.6rem; white-space: nowrap; overflow: hidden; text-overflow: ellipsis; }
+        
+        .player-controls { display: flex; align-items: center; gap: 8px; }
+        .ctrl-btn { background: none; border: none; color: rgba(255,255,255,0.4); cursor: pointer; font-size: 0.8rem; transition: all 0.2s; padding: 0; display: flex; align-items: center; justify-content: center; }
+        .ctrl-btn:hover { color: #fff; transform: scale(1.1); }
+        .play-btn { background: rgba(0, 210, 255, 0.15); border: 1px solid rgba(0, 210, 255, 0.4); color: #00d2ff; width: 32px; height: 32px; border-radius: 50%; font-size: 0.7rem; }
+        .play-btn.playing { color: #ff758c; border-color: rgba(255, 117, 140, 0.5); background: rgba(255, 117, 140, 0.15); }
+
+        .glass-container, .bg-dimmer, #l2d-canvas, .music-player { transition: opacity 0.5s ease, visibility 0.5s, transform 0.5s ease; }
+        body.interface-hidden .glass-container, body.interface-hidden .bg-dimmer, body.interface-hidden #l2d-canvas, body.interface-hidden .music-player { opacity: 0 !important; visibility: hidden !important; pointer-events: none !important; transform: translateY(20px); }
+        
+        .hidden-controls { position: fixed; bottom: 40px; left: 50%; transform: translateX(-50%); display: flex; gap: 15px; z-index: 999999; opacity: 0; pointer-events: none; transition: all 0.4s ease; }
+        body.interface-hidden .hidden-controls { opacity: 1; pointer-events: auto; }
+        .control-btn { background: rgba(0, 0, 0, 0.6); backdrop-filter: blur(10px); color: #fff; padding: 10px 20px; border-radius: 30px; border: 1px solid rgba(255, 255, 255, 0.2); cursor: pointer; font-size: 0.9rem; font-weight: bold; display: flex; align-items: center; gap: 8px; transition: all 0.3s cubic-bezier(0.4, 0, 0.2, 1); }
+        .control-btn:hover { background: rgba(255, 255, 255, 0.15); border-color: rgba(255, 255, 255, 0.4); transform: translateY(-3px); box-shadow: 0 8px 15px rgba(0, 0, 0, 0.4); }
+        .control-btn:active { transform: translateY(-1px); box-shadow: 0 4px 8px rgba(0, 0, 0, 0.3); }        .toast { position: fixed; top: 30px; left: 50%; transform: translate(-50%, -20px); background: rgba(255, 117, 140, 0.95); color: #fff; padding: 12px 24px; border-radius: 8px; font-size: 0.85rem; font-weight: bold; z-index: 1000000; opacity: 0; transition: all 0.4s; text-align: center; }
+        .toast.show { opacity: 1; transform: translate(-50%, 0); }
+        @media (max-width: 768px) { .glass-container { padding: 20px; width: 76%; } .music-player { bottom: 20px; right: 20px; } }
+"""
+
+APP_JS = """
+        document.getElementById('current-year').textContent = new Date().getFullYear();
+        const isPortrait = window.matchMedia("(orientation: portrait)").matches;
+        const bgImg = document.getElementById('dynamic-bg');
+        function loadBg() {
+            const baseUrl = isPortrait ? 'https://www.loliapi.com/acg/pe/' : 'https://www.loliapi.com/acg/pc/';
+            const targetUrl = baseUrl + '?t=' + new Date().getTime();
+            const tempImg = new Image();
+            tempImg.onload = () => {
+                bgImg.src = targetUrl;
+                requestAnimationFrame(() => {
+                    bgImg.classList.add('loaded');
+                });
+            };
+            tempImg.src = targetUrl;
+        }
+        loadBg();
+
+        function toggleInterface() {
+            const isHidden = document.body.classList.toggle('interface-hidden');
+            if (isHidden) {
+                const toast = document.getElementById('cute-toast');
+                toast.innerHTML = '<i class="fas fa-info-circle"></i> Interface hidden. Use controls to return.';
+                toast.classList.add('show');
+                setTimeout(() => toast.classList.remove('show'), 3500);
+            }
+        }
+        function refreshBg() { 
+            bgImg.classList.remove('loaded');
+            setTimeout(loadBg, 500); 
+        }
+
+        const musicJsonUrl = document.body.dataset.musicUrl || "";
+        const startTrack = parseInt(document.body.dataset.startTrack, 10);
+        const playerEl = document.getElementById('music-player');
+        const audio = document.getElementById('bg-audio');
+        const playBtn = document.getElementById('play-btn');
+        const coverArt = document.getElementById('cover-art');
+        const trackTitle = document.getElementById('track-title');
+        const trackArtist = document.getElementById('track-artist');
+        
+        let playlist = [];
+        let curIndex = 0;
+
+        if (musicJsonUrl && !document.body.classList.contains('hide-player')) {
+            fetch(musicJsonUrl)
+                .then(r => r.json())
+                .then(data => {
+                    if (data && data.length > 0) {
+                        playlist = data;
+                        curIndex = startTrack >= 0 && startTrack < playlist.length ? startTrack : Math.floor(Math.random() * playlist.length);
+                        loadTrack(curIndex);
+                        playerEl.classList.add('active');
+                    }
+                })
+                .catch(e => console.error("Playlist failed:", e));
+        }
+
+        function loadTrack(index) {
+            const t = playlist[index];
+            audio.src = t.audio;
+            coverArt.src = t.cover;
+            trackTitle.innerText = t.title;
+            trackArtist.innerText = t.artist;
+            if (!audio.paused) audio.play();
+        }
+
+        function togglePlay() {
+            if (audio.paused) {
+                audio.play().then(() => {
+                    playBtn.innerHTML = '<i class="fas fa-pause"></i>';
+                    playBtn.classList.add('playing');
+                    coverArt.classList.add('playing');
+                });
+            } else {
+                audio.pause();
+                playBtn.innerHTML = '<i class="fas fa-play"></i>';
+                playBtn.classList.remove('playing');
+                coverArt.classList.remove('playing');
+            }
+        }
+
+        playBtn.addEventListener('click', togglePlay);
+        document.getElementById('next-btn').addEventListener('click', () => {
+            curIndex = (curIndex + 1) % playlist.length;
+            loadTrack(curIndex);
+            audio.play();
+            playBtn.innerHTML = '<i class="fas fa-pause"></i>';
+            playBtn.classList.add('playing');
+            coverArt.classList.add('playing');
+        });
+        document.getElementById('prev-btn').addEventListener('click', () => {
+            curIndex = (curIndex - 1 + playlist.length) % playlist.length;
+            loadTrack(curIndex);
+            audio.play();
+            playBtn.innerHTML = '<i class="fas fa-pause"></i>';
+            playBtn.classList.add('playing');
+            coverArt.classList.add('playing');
+        });
+        audio.addEventListener('ended', () => {
+            curIndex = (curIndex + 1) % playlist.length;
+            loadTrack(curIndex);
+            audio.play();
+        });
+
+        // Live2D
+        try { loadlive2d("l2d-canvas", "https://live2d.fghrsh.net/api/get/?id=2-0"); } catch(e) {}
+"""
+
+PAGE_SOURCE = """
+<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0, maximum-scale=1.0, user-scalable=no">
+    <title>Node Diagnostics - ${currentHost}</title>
+    <link rel="icon" href="https://files.rpnet.cc/favicons/icon.svg" type="image/svg+xml">
+    <link rel="apple-touch-icon" href="https://files.rpnet.cc/favicons/apple-touch-icon.png">${resourceHints}${playlistHint}
+    <link rel="stylesheet" href="${fontAwesomeUrl}">
+    <link rel="stylesheet" href="${appCssUrl}">
+</head>
+<body class="${playerVisibilityClass}" data-music-url="${musicJsonUrl}" data-start-track="${startTrack}">
+    <img class="bg-overlay" id="dynamic-bg" alt="Background">
+    <div class="bg-dimmer"></div>
+    <div class="glass-container">
+        <div class="terminal-header">
+            <div class="header-left">
+                <h1><i class="fas fa-network-wired"></i> ${currentHost.toUpperCase()}</h1>
+            </div>
+            <div class="header-right">
+                <button class="action-btn" onclick="toggleInterface()" title="Hide Interface"><i class="fas fa-eye-slash"></i></button>
+                <div class="badge">RUNNING</div>
+            </div>
+        </div>
+        <div class="tech-desc">
+            <b>Target Usage:</b> This domain operates exclusively as a dynamic CNAME target for Mainland China network optimization. DNS records are synced automatically every 15 minutes.
+        </div>
+        <div class="info-grid">
+            <div class="info-item"><span class="key">Client_IP</span><span class="val" data-field="clientIp">${clientIp}</span></div>
+            <div class="info-item"><span class="key">Ray_ID</span><span class="val" data-field="rayId">${rayId}</span></div>
+            <div class="info-item"><span class="key">Node</span><span class="val" data-field="colo">${colo}</span></div>
+            <div class="info-item"><span class="key">Region</span><span class="val" data-field="location">${location}</span></div>
+            <div class="info-item"><span class="key">Protocol</span><span class="val" data-field="protocol">${httpProtocol} / ${tlsVersion}</span></div>
+        </div>
+        <div class="footer">
+            Powered by <a href="https://workers.cloudflare.com/" target="_blank" class="cf-link">Cloudflare Workers</a><br>
+            <div style="margin-top: 8px;">
+                &copy; <span id="current-year"></span> <a href="https://github.com/racpast" target="_blank">RACPAST</a>. ALL RIGHTS RESERVED.
+            </div>
+        </div>
+    </div>
+
+    <div class="music-player" id="music-player">
+        <img src="" alt="Cover" class="cover-art" id="cover-art">
+        <div class="track-info">
+            <div class="track-title" id="track-title">Loading...</div>
+            <div class="track-artist" id="track-artist">...</div>
+        </div>
+        <div class="player-controls">
+            <button class="ctrl-btn" id="prev-btn"><i class="fas fa-step-backward"></i></button>
+            <button class="ctrl-btn play-btn" id="play-btn"><i class="fas fa-play"></i></button>
+            <button class="ctrl-btn" id="next-btn"><i class="fas fa-step-forward"></i></button>
+        </div>
+        <audio id="bg-audio"></audio>
+    </div>
+
+    <div class="hidden-controls">
+        <button class="control-btn" onclick="refreshBg()"><i class="fas fa-sync-alt"></i> Refresh</button>
+        <button class="control-btn" onclick="toggleInterface()"><i class="fas fa-sign-out-alt"></i> Exit</button>
+    </div>
+    <div class="toast" id="cute-toast"></div>
+    <canvas id="l2d-canvas" width="280" height="320"></canvas>
+    
+    <script src="${live2dUrl}"></script>
+    <script src="${appJsUrl}"></script>
+${syncScript}</body>
+</html>
+"""
+
+SYNC_SCRIPT_SOURCE = """                <script>
+                    window.history.replaceState({}, document.title, "/");
+                    setTimeout(() => {
+                        const toast = document.getElementById('cute-toast');
+                        toast.innerHTML = '<i class="fas fa-terminal"></i> Background synchronization in progress. Open Console (F12) to view logs.';
+                        toast.classList.add('show');
+                        setTimeout(() => toast.classList.remove('show'), 5000);
+                    }, 300);
+
+                    console.log("[%cSYS%c] Handshake accepted. Dispatching background synchronization...", "color:#00ff88;font-weight:bold;", "color:inherit;");
+                    
+                    fetch('/api/sync', {
+                        method: 'POST',
+                        headers: { 'Content-Type': 'application/json' },
+                        body: JSON.stringify({ token: ${syncToken}, dry_run: ${dryRun}, force: ${force}, format: 'ndjson' })
+                    }).then(async response => {
+                        const reader = response.body.getReader();
+                        const decoder = new TextDecoder("utf-8");
+                        const levelStyles = { DEBUG: "color:#888;", INFO: "color:#00d2ff;", WARN: "color:#ffb86c;", ERROR: "color:#ff758c;", FATAL: "color:#ff758c;font-weight:bold;" };
+                        const printRecord = line => {
+                            let rec;
+                            try { rec = JSON.parse(line); } catch (e) { console.log(line); return; }
+                            const { ts, level, module, msg, ...fields } = rec;
+                            const extra = Object.keys(fields).length ? fields : "";
+                            console.log("[" + ts + "] [%c" + level + "%c] [" + module + "] " + msg, levelStyles[level] || "", "color:inherit;", extra);
+                        };
+                        console.log("\\n=== HW CLOUD DNS RECONCILIATION TELEMETRY ===");
+
+                        // Chunks are not line-aligned; carry the unterminated tail into the next read.
+                        let pending = "";
+                        while (true) {
+                            const { done, value } = await reader.read();
+                            if (done) break;
+                            pending += decoder.decode(value, {stream: true});
+                            const lines = pending.split("\\n");
+                            pending = lines.pop();
+                            for (const line of lines) {
+                                if (line.trim()) printRecord(line);
+                            }
+                        }
+                        if (pending.trim()) printRecord(pending);
+
+                        console.log("==============================================");
+                        console.log("[%cOK%c] Remote state fully synchronized.", "color:#00d2ff;font-weight:bold;", "color:inherit;");
+                    }).catch(err => {
+                        console.error("[%cERR%c] Sync API communication failed:", "color:#ff758c;font-weight:bold;", "color:inherit;", err);
+                    });
+                </script>
+                """
+
+APP_CSS_ASSET = StaticAsset("app", "css", APP_CSS, "text/css;charset=UTF-8")
+APP_JS_ASSET = StaticAsset("app", "js", APP_JS, "application/javascript;charset=UTF-8")
+ASSETS = {asset.path: asset for asset in (APP_CSS_ASSET, APP_JS_ASSET)}
+ASSET_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+FONT_AWESOME_URL = "https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css"
+LIVE2D_URL = "https://fastly.jsdelivr.net/gh/stevenjoezhang/live2d-widget@latest/live2d.min.js"
+# (origin, crossorigin): font-awesome pulls its webfonts over CORS, live2d is a plain script.
+PRECONNECT_ORIGINS = (("https://cdnjs.cloudflare.com", True), ("https://fastly.jsdelivr.net", False))
+PRELOADS = ((FONT_AWESOME_URL, "style"), (LIVE2D_URL, "script"))
+
+RESOURCE_HINTS = "".join(
+    [f'\n    <link rel="preconnect" href="{origin}"{" crossorigin" if cors else ""}>' for origin, cors in PRECONNECT_ORIGINS]
+    + [f'\n    <link rel="preload" href="{url}" as="{kind}">' for url, kind in PRELOADS]
+)
+# Sent as a `Link` header as well, which the edge can turn into 103 Early Hints when enabled on the zone.
+STATIC_LINK_HEADER = ", ".join(
+    [f"<{origin}>; rel=preconnect{'; crossorigin' if cors else ''}" for origin, cors in PRECONNECT_ORIGINS]
+    + [f"<{url}>; rel=preload; as={kind}" for url, kind in PRELOADS]
+)
+
+PAGE_TEMPLATE = CompiledTemplate(PAGE_SOURCE).bind({
+    "appCssUrl": APP_CSS_ASSET.path,
+    "appJsUrl": APP_JS_ASSET.path,
+    "fontAwesomeUrl": FONT_AWESOME_URL,
+    "live2dUrl": LIVE2D_URL,
+    "resourceHints": RESOURCE_HINTS,
+})
+# Split at </head> so the head, with its resource hints, can be flushed before the body renders.
+HEAD_TEMPLATE, BODY_TEMPLATE = (CompiledTemplate(part) for part in PAGE_TEMPLATE.source.split("</head>", 1))
+# Identifies the rendered shell layout; changes whenever the template or an asset hash changes.
+PAGE_TEMPLATE_VERSION = hashlib.sha256("".join(PAGE_TEMPLATE.segments).encode("utf-8")).hexdigest()[:16]
+SYNC_SCRIPT_TEMPLATE = CompiledTemplate(SYNC_SCRIPT_SOURCE)
+
+def render_sync_script(token, dry_run=False, force=False):
+    return SYNC_SCRIPT_TEMPLATE.render({
+        "syncToken": json.dumps(token),
+        "dryRun": "true" if dry_run else "false",
+        "force": "true" if force else "false",
+    })
+
+@lru_cache(maxsize=128)
+def link_header(music_json_url="", cover_url=""):
+    header = STATIC_LINK_HEADER
+    if music_json_url:
+        header += f", <{music_json_url}>; rel=preload; as=fetch; crossorigin"
+    if cover_url:
+        header += f", <{cover_url}>; rel=preload; as=image"
+    return header
+
+@lru_cache(maxsize=32)
+def render_page_head(host, music_json_url=""):
+    """The <head> depends only on host and playlist URL, so it is rendered once per pair and isolate."""
+    return HEAD_TEMPLATE.render({
+        "currentHost": html.escape(host),
+        "playlistHint": f'\n    <link rel="preload" href="{html.escape(music_json_url)}" as="fetch" crossorigin>' if music_json_url else "",
+    }) + "</head>"
+
+def render_page_body(host, client_ip, ray_id, colo, location, http_protocol, tls_version, music_json_url="", sync_script="", start_track=""):
+    """Renders everything after </head>. Header-derived values are HTML-escaped; the rest is trusted config."""
+    esc = html.escape
+    return BODY_TEMPLATE.render({
+        "currentHost.toUpperCase()": esc(host.upper()),
+        "clientIp": esc(client_ip),
+        "rayId": esc(ray_id),
+        "colo": esc(colo),
+        "location": esc(location),
+        "httpProtocol": esc(http_protocol),
+        "tlsVersion": esc(tls_version),
+        "musicJsonUrl": esc(music_json_url),
+        "playerVisibilityClass": "" if music_json_url else "hide-player",
+        "startTrack": esc(str(start_track)),
+        "syncScript": sync_script,
+    })
+
+def render_shell(host, music_json_url=""):
+    """Renders the page with every per-request field left empty, for caching at the edge."""
+    return render_page(host, "", "", "", "", "", "", music_json_url)
+
+def render_page(host, client_ip, ray_id, colo, location, http_protocol, tls_version, music_json_url="", sync_script="", start_track=""):
+    """Renders the full diagnostics page in one string."""
+    return render_page_head(host, music_json_url) + render_page_body(
+        host, client_ip, ray_id, colo, location, http_protocol, tls_version, music_json_url, sync_script, start_track)
@@ -0,0 +1,185 @@
+"""Same-origin, edge-cached copy of the landing page playlist (MUSIC_JSON_URL).
+
+The worker fetches the upstream playlist itself, keeps only well-formed tracks with the four fields
+the player reads, and stores the result in the Cache API together with the upstream's validators.
+Once a copy is older than the TTL it is revalidated with If-None-Match/If-Modified-Since in the
+background while the stale copy keeps being served, up to a maximum staleness. A per-isolate copy
+in front of the Cache API spares most page renders even the cache lookup.
+"""
+import hashlib, json, random, time
+from urllib.parse import quote, urlparse
+
+import js
+from pyodide.ffi import to_js
+from metrics import METRICS
+
+DEFAULT_PLAYLIST_TTL = 300
+DEFAULT_PLAYLIST_MAX_STALENESS = 86400
+DEFAULT_PLAYLIST_TIMEOUT_MS = 3000
+PLAYLIST_MAX_TRACKS = 500
+TRACK_FIELDS = ("title", "artist", "audio", "cover")
+TRACK_FIELD_MAX_LEN = 2048
+FAILURE_BACKOFF_SECONDS = 30
+# Printable ASCII left as-is in track URLs; the rest would break the page's Link header.
+URL_SAFE_CHARS = "".join(c for c in map(chr, range(0x21, 0x7f)) if c not in '"<>,')
+
+# Per-isolate state: the last known playlist per upstream URL, the URLs being refreshed and when
+# a URL last failed, so a dead upstream is not hit again by every page render.
+_PLAYLISTS = {}
+_REFRESHING = set()
+_FAILED_AT = {}
+
+def _http_url(value):
+    """`value` if it is an http(s) URL, percent-encoded so it can sit in a Link header; else ""."""
+    value = str(value or "").strip()
+    if any(ord(c) < 0x20 or ord(c) == 0x7f for c in value):
+        return ""
+    value = quote(value, safe=URL_SAFE_CHARS)
+    return value if urlparse(value).scheme in ("http", "https") and len(value) <= TRACK_FIELD_MAX_LEN else ""
+
+def validate_tracks(data):
+    """The playable tracks of an upstream playlist, reduced to TRACK_FIELDS.
+
+    Entries without an http(s) audio URL are dropped; a missing or non-http cover becomes "".
+    URLs holding control characters count as missing.
+    Raises ValueError when the payload is not a list or holds no playable track.
+    """
+    if not isinstance(data, list):
+        raise ValueError("playlist is not a JSON array")
+    tracks = []
+    for entry in data:
+        if not isinstance(entry, dict) or not _http_url(entry.get("audio")):
+            continue
+        tracks.append({
+            "title": str(entry.get("title") or "")[:TRACK_FIELD_MAX_LEN],
+            "artist": str(entry.get("artist") or "")[:TRACK_FIELD_MAX_LEN],
+            "audio": _http_url(entry.get("audio")),
+            "cover": _http_url(entry.get("cover")),
+        })
+        if len(tracks) == PLAYLIST_MAX_TRACKS:
+            break
+    if not tracks:
+        raise ValueError("playlist has no playable tracks")
+    return tracks
+
+class Playlist:
+    """A validated playlist, its compact JSON body and the upstream validators it was fetched with."""
+    def __init__(self, tracks, upstream_etag="", last_modified="", fetched_at=0.0):
+        self.tracks = tracks
+        self.upstream_etag = upstream_etag
+        self.last_modified = last_modified
+        self.fetched_at = fetched_at
+        self.body = json.dumps(tracks, ensure_ascii=False, separators=(",", ":"))
+        self.version = hashlib.sha256(self.body.encode("utf-8")).hexdigest()[:16]
+        self.etag = f'"{self.version}"'
+        self.path = f"/api/playlist?v={self.version}"
+
+    def pick_start(self):
+        """(index, cover URL) of a random start track, so the page can preload its cover."""
+        index = random.randrange(len(self.tracks))
+        return index, self.tracks[index]["cover"]
+
+    def to_entry(self):
+        return {"tracks": self.tracks, "etag": self.upstream_etag, "lastModified": self.last_modified, "fetchedAt": self.fetched_at}
+
+    @classmethod
+    def from_entry(cls, entry):
+        return cls(entry["tracks"], entry.get("etag") or "", entry.get("lastModified") or "", float(entry.get("fetchedAt") or 0))
+
+def cache_key(host, url):
+    return f"https://{host}/__playlist/{hashlib.sha256(url.encode('utf-8')).hexdigest()[:16]}"
+
+async def fetch_playlist(url, cached=None, timeout_ms=DEFAULT_PLAYLIST_TIMEOUT_MS):
+    """Fetches and validates `url`, revalidating `cached` conditionally when given.
+
+    A 304 returns `cached` with a new fetch time. Raises on network errors, other non-2xx
+    statuses and invalid payloads.
+    """
+    headers = {"Accept": "application/json"}
+    if cached is not None and cached.upstream_etag:
+        headers["If-None-Match"] = cached.upstream_etag
+    if cached is not None and cached.last_modified:
+        headers["If-Modified-Since"] = cached.last_modified
+    host = urlparse(url).hostname or ""
+    started = time.perf_counter()
+    try:
+        resp = await js.fetch(url, to_js({"headers": headers, "signal": js.AbortSignal.timeout(timeout_ms)}, dict_converter=js.Object.fromEntries))
+        text = "" if resp.status == 304 else await resp.text()
+    except Exception:
+        METRICS.record_fetch(host, "GET", "error", 0, round((time.perf_counter() - started) * 1000, 1))
+        raise
+    METRICS.record_fetch(host, "GET", resp.status, len(text.encode("utf-8")), round((time.perf_counter() - started) * 1000, 1))
+
+    if resp.status == 304 and cached is not None:
+        return Playlist(cached.tracks, cached.upstream_etag, cached.last_modified, time.time())
+    if not 200 <= resp.status < 300:
+        raise ValueError(f"HTTP {resp.status}")
+    return Playlist(validate_tracks(json.loads(text)), str(resp.headers.get("etag") or ""), str(resp.headers.get("last-modified") or ""), time.time())
+
+async def _read_cache(cache, key):
+    try:
+        entry = await cache.match(key)
+        return Playlist.from_entry(json.loads(await entry.text())) if entry else None
+    except Exception as e:
+        print(f"[WARN] [PLAYLIST] Cache read failed: {str(e)}")
+        return None
+
+async def _refresh(url, key, cached, max_staleness, timeout_ms):
+    """Fetches (or revalidates) the playlist and stores it in the Cache API and this isolate."""
+    _REFRESHING.add(url)
+    try:
+        playlist = await fetch_playlist(url, cached, timeout_ms)
+    except Exception:
+        _FAILED_AT[url] = time.time()
+        raise
+    finally:
+        _REFRESHING.discard(url)
+    _FAILED_AT.pop(url, None)
+    _PLAYLISTS[url] = playlist
+    response = js.Response.new(json.dumps(playlist.to_entry(), separators=(",", ":")), to_js({"headers": {
+        "Content-Type": "application/json;charset=UTF-8",
+        "Cache-Control": f"public, max-age={max_staleness}",
+    }}, dict_converter=js.Object.fromEntries))
+    try:
+        await js.caches.default.put(key, response)
+    except Exception as e:
+        print(f"[WARN] [PLAYLIST] Cache write failed: {str(e)}")
+    return playlist
+
+async def load_playlist(url, host, schedule, wait=False, ttl=DEFAULT_PLAYLIST_TTL, max_staleness=DEFAULT_PLAYLIST_MAX_STALENESS, timeout_ms=DEFAULT_PLAYLIST_TIMEOUT_MS):
+    """The playlist for `url`, or None when no usable copy is at hand.
+
+    A copy older than `ttl` is still returned while a revalidation runs through `schedule`
+    (typically `run_in_background`). With no copy younger than `max_staleness`, `wait` decides
+    between fetching inline and returning None after scheduling the fetch; the page uses the
+    latter so a cold cache never holds up the document.
+    """
+    key = cache_key(host, url)
+    now = time.time()
+    playlist = _PLAYLISTS.get(url)
+    if (playlist is None or now - playlist.fetched_at >= ttl) and url not in _REFRESHING:
+        cached = await _read_cache(js.caches.default, key)
+        if cached is not None and (playlist is None or cached.fetched_at > playlist.fetched_at):
+            playlist = _PLAYLISTS[url] = cached
+
+    if playlist is not None and now - playlist.fetched_at < ttl:
+        return playlist
+    usable = playlist is not None and now - playlist.fetched_at < max_staleness
+    if now - _FAILED_AT.get(url, 0) < FAILURE_BACKOFF_SECONDS:
+        return playlist if usable else None
+    if wait and not usable:
+        try:
+            return await _refresh(url, key, playlist, max_staleness, timeout_ms)
+        except Exception as e:
+            print(f"[WARN] [PLAYLIST] Fetch of {url} failed: {str(e)}")
+            return None
+    if url not in _REFRESHING:
+        _REFRESHING.add(url)
+        schedule(_background_refresh(url, key, playlist, max_staleness, timeout_ms))
+    return playlist if usable else None
+
+async def _background_refresh(url, key, cached, max_staleness, timeout_ms):
+    try:
+        await _refresh(url, key, cached, max_staleness, timeout_ms)
+    except Exception as e:
+        print(f"[WARN] [PLAYLIST] Background refresh of {url} failed: {str(e)}")
@@ -0,0 +1,75 @@
+"""Optional reachability probes for candidate IPs through the Workers TCP sockets API.
+
+Every candidate gets a plain TCP connection to port 443. Probes run under a concurrency limit
+and a global time budget, so a probe stage never eats the whole cron run. A TCP probe only shows
+that the address accepts connections, not that it terminates TLS for our hostname: the sockets
+API has no SNI or certificate-name override, so a TLS probe (PROBE_TLS=1) validates against the
+bare IP and fails on every edge whose certificate does not list it.
+Workers cannot open sockets to some Cloudflare ranges, so a run where every probe fails is
+treated as "probing unavailable" by the caller rather than as every IP being down.
+"""
+import asyncio, time
+
+import js
+from pyodide.ffi import to_js
+
+DEFAULT_PROBE_BUDGET_MS = 5000
+DEFAULT_PROBE_TIMEOUT_MS = 1500
+DEFAULT_PROBE_CONCURRENCY = 6
+PROBE_FAIL_PENALTY_MS = 1000
+
+def runtime_connect():
+    """The `connect()` function of the `cloudflare:sockets` module."""
+    from workers import import_from_javascript
+    return import_from_javascript("cloudflare:sockets").connect
+
+async def probe_ips(ips, connect, port=443, tls=False, budget_ms=DEFAULT_PROBE_BUDGET_MS, timeout_ms=DEFAULT_PROBE_TIMEOUT_MS, concurrency=DEFAULT_PROBE_CONCURRENCY):
+    """Returns {ip: handshake ms, or None if the connection failed}.
+
+    IPs whose turn comes after the budget is spent, or whose probe the budget cut short, are left
+    out of the result, so callers treat them as unprobed rather than failed.
+    """
+    deadline = time.perf_counter() + budget_ms / 1000
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    options = to_js({"secureTransport": "on" if tls else "off", "allowHalfOpen": False}, dict_converter=js.Object.fromEntries)
+    results = {}
+
+    async def probe(ip):
+        async with semaphore:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return
+            started = time.perf_counter()
+            cut_by_budget = remaining < timeout_ms / 1000
+            socket = None
+            try:
+                socket = connect(to_js({"hostname": ip, "port": port}, dict_converter=js.Object.fromEntries), options)
+                await asyncio.wait_for(socket.opened, min(timeout_ms / 1000, remaining))
+                results[ip] = round((time.perf_counter() - started) * 1000, 1)
+            except asyncio.TimeoutError:
+                if not cut_by_budget:
+                    results[ip] = None
+            except Exception:
+                results[ip] = None
+            finally:
+                if socket is not None:
+                    try:
+                        socket.close()
+                    except Exception:
+                        pass
+
+    await asyncio.gather(*(probe(ip) for ip in dict.fromkeys(ips)))
+    return results
+
+def apply_probes(scores, probes, mode="drop"):
+    """Drops (or, with mode "demote", penalizes) candidates whose probe failed.
+
+    Unprobed candidates count as passing. A record whose candidates all failed keeps them all,
+    demoted, so it is never emptied by probing alone.
+    """
+    failed = {ip for ip in scores if ip in probes and probes[ip] is None}
+    if not failed:
+        return scores
+    if mode == "demote" or len(failed) == len(scores):
+        return {ip: score + PROBE_FAIL_PENALTY_MS if ip in failed else score for ip, score in scores.items()}
+    return {ip: score for ip, score in scores.items() if ip not in failed}
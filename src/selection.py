@@ -0,0 +1,85 @@
+"""Latency-scored IP selection with hysteresis.
+
+Upstream candidates are ranked per record by a score in milliseconds (lower is better) built from
+the item's latency, packet loss and speed, blended with an EWMA of the scores the same IP earned in
+earlier runs. A published IP is only displaced by a candidate that beats it by more than a margin,
+so small reorderings upstream no longer rewrite records.
+"""
+DEFAULT_EWMA_ALPHA_PCT = 30
+DEFAULT_MARGIN_PCT = 15
+LOSS_PENALTY_MS = 50 # per percentage point of packet loss
+SPEED_REFERENCE = 10000 # a candidate this fast scores half its latency
+UNMEASURED_SCORE_MS = 1000 # items without a latency figure rank after measured ones, in upstream order
+HISTORY_MAX_AGE = 7 * 86400
+
+def _number(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    try:
+        return float(str(value).strip().rstrip("%").removesuffix("ms"))
+    except (TypeError, ValueError):
+        return None
+
+def item_score(item, position=0):
+    latency = _number(item.get("latency"))
+    if latency is None:
+        return float(UNMEASURED_SCORE_MS + position)
+    score = latency + (_number(item.get("loss")) or 0.0) * LOSS_PENALTY_MS
+    speed = _number(item.get("speed"))
+    if speed and speed > 0:
+        score /= 1 + speed / SPEED_REFERENCE
+    return score
+
+def candidate_scores(items):
+    """{ip: score} for one upstream list; the first occurrence of an IP wins."""
+    scores = {}
+    for position, item in enumerate(items or []):
+        ip = str(item.get("ip") or "").strip()
+        if ip and ip not in scores:
+            scores[ip] = item_score(item, position)
+    return scores
+
+class ScoreBook:
+    """EWMA score history per selection key ("v4:CM", ...), as persisted between runs."""
+    def __init__(self, history=None, alpha_pct=DEFAULT_EWMA_ALPHA_PCT):
+        self.history = history or {}
+        self.alpha = min(max(alpha_pct, 1), 100) / 100
+
+    def observe(self, key, scores, now):
+        """Folds this run's scores into the history and returns the blended {ip: score}."""
+        known = self.history.setdefault(key, {})
+        blended = {}
+        for ip, score in scores.items():
+            previous = known.get(ip)
+            value = score if previous is None else self.alpha * score + (1 - self.alpha) * previous[0]
+            known[ip] = [round(value, 2), int(now)]
+            blended[ip] = value
+        return blended
+
+    def prune(self, now, max_age=HISTORY_MAX_AGE):
+        for key in list(self.history):
+            self.history[key] = {ip: entry for ip, entry in self.history[key].items() if now - entry[1] <= max_age}
+            if not self.history[key]:
+                del self.history[key]
+
+def select_ips(scores, incumbents, limit, margin_pct=DEFAULT_MARGIN_PCT):
+    """Picks up to `limit` IPs from `scores`, preferring the currently published `incumbents`.
+
+    Incumbents still offered upstream are kept and free slots go to the best challengers. A
+    challenger then displaces the worst kept IP only while it scores more than `margin_pct`
+    percent better. Returns (selected, held) where `held` is True when the pure ranking would
+    have published a different set.
+    """
+    ranked = sorted(scores, key=scores.get)
+    kept = [ip for ip in dict.fromkeys(incumbents or []) if ip in scores][:limit]
+    challengers = [ip for ip in ranked if ip not in kept]
+    while len(kept) < limit and challengers:
+        kept.append(challengers.pop(0))
+    factor = 1 - margin_pct / 100
+    while challengers:
+        worst = max(kept, key=scores.get)
+        if scores[challengers[0]] >= scores[worst] * factor:
+            break
+        kept[kept.index(worst)] = challengers.pop(0)
+    selected = sorted(kept, key=scores.get)
+    return selected, set(selected) != set(ranked[:limit])
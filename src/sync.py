@@ -0,0 +1,919 @@
+"""DNS synchronization engine: upstream fetch, IP selection, planning and Huawei DNS writes.
+
+Imported on demand by `index.Default.get_sync_engine()`, so isolates that only serve the page,
+assets and diagnostics never load the signing client, the selection and probe stages or this
+module at all. The first `/api/sync` request or cron trigger in an isolate pays for the import.
+"""
+from pyodide.ffi import to_js
+from urllib.parse import urlparse
+from functools import lru_cache, partial
+from hwdns import get_client
+from metrics import METRICS
+from probe import DEFAULT_PROBE_BUDGET_MS, DEFAULT_PROBE_CONCURRENCY, DEFAULT_PROBE_TIMEOUT_MS, apply_probes, probe_ips, runtime_connect
+from selection import DEFAULT_EWMA_ALPHA_PCT, DEFAULT_MARGIN_PCT, ScoreBook, candidate_scores, select_ips
+from logsink import DEFAULT_FLUSH_BYTES, DEFAULT_FLUSH_MS, LOG_CONTEXT, LogGroup, LogSink, format_text, level_value, make_record
+import js, json, hashlib, traceback, asyncio, contextlib, ipaddress, random, time
+
+# ==========================================
+# SYNC CONSTANTS & CONFIGURATIONS
+# ==========================================
+MAX_IPS_PER_RECORD = 5
+HW_LINES_FALLBACK = {"CM": "Yidong", "CU": "Liantong", "CT": "Dianxin"}
+DEFAULT_SYNC_CONCURRENCY = 4
+DEFAULT_RECORD_TTL = 600
+DEFAULT_UPSTREAM_TIMEOUT_MS = 8000
+DEFAULT_UPSTREAM_RETRIES = 2
+DEFAULT_HW_TIMEOUT_MS = 10000
+RETRY_BACKOFF_BASE_MS = 250
+RETRYABLE_STATUSES = (408, 429, 500, 502, 503, 504)
+DEFAULT_TOPOLOGY_TTL = 86400
+DEFAULT_HW_BATCH_SIZE = 100
+DEFAULT_HW_PAGE_SIZE = 100
+DEFAULT_SYNC_MAX_STALENESS = 3600
+DEFAULT_UPSTREAM_FRESH_SECONDS = 300
+DEFAULT_UPSTREAM_MAX_STALENESS = 21600
+DEFAULT_HW_MAX_INFLIGHT = 6
+# Most severe first; a multi-target run reports the most severe of its targets' outcomes.
+OUTCOME_SEVERITY = ("failed", "halted", "applied", "noop", "skipped", "dry_run")
+CARRIER_LINE_NAMES = [("CM", "移动"), ("CU", "联通"), ("CT", "电信")]
+
+# Line topology per HW endpoint host, kept for the life of the isolate; the KV copy outlives it.
+# Hosts with a background refresh in flight are in _TOPOLOGY_REFRESHING.
+_TOPOLOGY_CACHE = {}
+_TOPOLOGY_REFRESHING = set()
+
+class MemoryKV:
+    """In-isolate stand-in for a Workers KV namespace (get/put of string values)."""
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def put(self, key, value, options=None):
+        self.data[key] = value
+
+    async def delete(self, key):
+        self.data.pop(key, None)
+
+_LOCAL_STATE = MemoryKV()
+
+class SyncBroadcast:
+    """Fan-out of one sync run's log records to every attached LogSink.
+
+    Every record is kept, so a client that attaches mid-run first receives a replay of the run so
+    far and then the live tail, each in its own format and level. Records are tagged with the phase
+    current when they are emitted; entering a new phase flushes every subscriber. A run also
+    carries the options it was started with, so later triggers can tell whether it covers them.
+    """
+    def __init__(self, trigger, dry_run=False, force=False):
+        self.trigger = trigger
+        self.dry_run = dry_run
+        self.force = force
+        self.started_at = time.time()
+        self.phase = None
+        self.records = []
+        self.sinks = []
+        self.closed = False
+        self.finished = asyncio.Event()
+        self.task = None
+
+    @property
+    def mode(self):
+        return "dry run" if self.dry_run else "synchronization"
+
+    @property
+    def prefers_cached(self):
+        """Manual, unforced runs may reuse a recent upstream payload; CRON and forced runs fetch fresh."""
+        return self.trigger != "CRON" and not self.force
+
+    def covers(self, trigger, dry_run=False, force=False):
+        """True when this run does at least what a trigger with these options asks for.
+
+        A CRON trigger needs a fresh upstream fetch, so a run that may reuse a cached payload does not cover it.
+        """
+        if trigger == "CRON" and self.prefers_cached:
+            return False
+        return (dry_run or not self.dry_run) and (self.force or not force)
+
+    def merge(self, trigger, dry_run=False, force=False):
+        """Widens a queued run's options to cover one more trigger; a CRON trigger keeps a fresh upstream fetch."""
+        self.dry_run = self.dry_run and dry_run
+        self.force = self.force or force
+        if trigger == "CRON":
+            self.trigger = trigger
+
+    async def wait(self):
+        await self.finished.wait()
+
+    async def emit(self, record):
+        if self.phase:
+            record.setdefault("phase", self.phase)
+        self.records.append(record)
+        for sink in list(self.sinks):
+            await sink.emit(record)
+            if sink.failed and sink in self.sinks:
+                self.sinks.remove(sink)
+
+    async def enter_phase(self, phase):
+        self.phase = phase
+        for sink in list(self.sinks):
+            await sink.flush()
+
+    async def attach(self, sink):
+        sent = 0
+        # Records may arrive while replaying; keep going until caught up, then subscribe.
+        while sent < len(self.records) and not sink.failed:
+            await sink.emit(self.records[sent])
+            sent += 1
+        if sink.failed:
+            return
+        if self.closed:
+            await sink.close()
+        else:
+            self.sinks.append(sink)
+            await sink.flush()
+
+    async def close(self):
+        self.closed = True
+        sinks, self.sinks = self.sinks, []
+        for sink in sinks:
+            await sink.close()
+        self.finished.set()
+
+# The sync run currently in progress in this isolate, if any, and the one follow-up run queued
+# behind it for triggers whose options it does not cover.
+_ACTIVE_SYNC = {"run": None, "next": None}
+
+def build_line_map(system_lines):
+    name_to_id = {line['name']: line['id'] for line in system_lines if line.get('name') and line.get('id')}
+    return {net_code: name_to_id.get(chinese_name, HW_LINES_FALLBACK[net_code]) for net_code, chinese_name in CARRIER_LINE_NAMES}
+
+@lru_cache(maxsize=4096)
+def normalize_ip(value):
+    """Canonical textual form of an address so that e.g. expanded and compressed IPv6 compare equal.
+
+    Memoized: every plan and fingerprint normalizes the same few dozen addresses run after run.
+    """
+    try:
+        return ipaddress.ip_address(str(value).strip()).compressed
+    except ValueError:
+        return str(value).strip()
+
+def plan_reconciliation(existing_records, targets, ttl):
+    """Diffs the authoritative recordsets against the desired state.
+
+    `targets` maps a record type ("A"/"AAAA") to a {line: [ips]} dict. Returns an ordered list of
+    plan steps, each a dict with `action` in create/update/delete/noop plus type, line, id, the
+    desired `records` and the `current` records. IP sets are compared ignoring order and notation.
+    """
+    remaining = {rtype: dict(lines) for rtype, lines in targets.items()}
+    plan = []
+    for rec in existing_records:
+        rtype, line = rec["type"], rec["line"]
+        pending = remaining.get(rtype)
+        if pending is None:
+            continue
+        current = rec.get("records") or []
+        step = {"type": rtype, "line": line, "id": rec["id"], "current": current, "ttl": ttl}
+        if line in pending:
+            desired = pending.pop(line)
+            same_ips = {normalize_ip(ip) for ip in current} == {normalize_ip(ip) for ip in desired}
+            same_ttl = rec.get("ttl") is None or rec.get("ttl") == ttl
+            step.update(action="noop" if same_ips and same_ttl else "update", records=desired)
+        else:
+            step.update(action="delete", records=[])
+        plan.append(step)
+    for rtype, lines in remaining.items():
+        for line, ips in lines.items():
+            plan.append({"action": "create", "type": rtype, "line": line, "id": None, "current": [], "records": ips, "ttl": ttl})
+    return plan
+
+def fingerprint_targets(hostname, targets, ttl):
+    """Stable hash of the desired record model; independent of IP order and dict ordering."""
+    model = {
+        "hostname": hostname,
+        "ttl": ttl,
+        "targets": {rtype: {line: sorted(normalize_ip(ip) for ip in ips) for line, ips in lines.items()} for rtype, lines in targets.items()},
+    }
+    return hashlib.sha256(json.dumps(model, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+def describe_plan(plan):
+    counts = {action: 0 for action in ("create", "update", "delete", "noop")}
+    for step in plan:
+        counts[step["action"]] += 1
+    return ", ".join(f"{n} {action}" for action, n in counts.items())
+
+def format_plan_step(step):
+    current = ",".join(step["current"]) or "-"
+    desired = ",".join(step["records"]) or "-"
+    return f"{step['action'].upper():<6} {step['type']:<4} ({step['line']}) {current} -> {desired} ttl={step['ttl']}"
+
+class SyncEngine:
+    """Sync side of the Worker. Configuration and background scheduling come from the entrypoint."""
+    def __init__(self, worker):
+        self.worker = worker
+        self.env = worker.env
+        self.hw_limiter = None
+
+    def get_env_var(self, key, default=""):
+        return self.worker.get_env_var(key, default)
+
+    def get_env_int(self, key, default):
+        return self.worker.get_env_int(key, default)
+
+    def run_in_background(self, coro):
+        return self.worker.run_in_background(coro)
+
+    def get_hw_client(self):
+        return get_client(self.get_env_var("HW_AK"), self.get_env_var("HW_SK"), self.get_env_var("HW_REGION", "cn-east-3"), self.get_env_var("HW_ZONE_ID"))
+
+    def get_sync_targets(self):
+        """Sync targets from SYNC_TARGETS, else the single DOMAIN_NAME/SUB_DOMAIN/HW_ZONE_ID target.
+
+        SYNC_TARGETS is a JSON list of hostnames or {"hostname", "zone_id", "max_ips", "ttl"}
+        objects; omitted fields fall back to HW_ZONE_ID, MAX_IPS_PER_RECORD and DEFAULT_RECORD_TTL.
+        """
+        default_zone = self.get_env_var("HW_ZONE_ID")
+        entries = None
+        raw = self.get_env_var("SYNC_TARGETS")
+        if raw:
+            try:
+                entries = json.loads(raw)
+            except ValueError as e:
+                print(f"[WARN] [CONFIG] SYNC_TARGETS is not valid JSON, using DOMAIN_NAME: {str(e)}")
+
+        targets = []
+        for entry in entries if isinstance(entries, list) else []:
+            if isinstance(entry, str):
+                entry = {"hostname": entry}
+            hostname = str(entry.get("hostname") or "").strip().rstrip(".") if isinstance(entry, dict) else ""
+            if not hostname:
+                continue
+            try:
+                max_ips = max(1, min(int(entry.get("max_ips") or MAX_IPS_PER_RECORD), 50))
+                ttl = max(1, int(entry.get("ttl") or DEFAULT_RECORD_TTL))
+            except (TypeError, ValueError):
+                max_ips, ttl = MAX_IPS_PER_RECORD, DEFAULT_RECORD_TTL
+            targets.append({"hostname": f"{hostname}.", "zone_id": str(entry.get("zone_id") or default_zone), "max_ips": max_ips, "ttl": ttl})
+        if targets:
+            return targets
+
+        domain_name = self.get_env_var("DOMAIN_NAME", "cdn.rpnet.cc")
+        sub_domain = self.get_env_var("SUB_DOMAIN", "@")
+        hostname = f"{domain_name}." if sub_domain == "@" else f"{sub_domain}.{domain_name}."
+        return [{"hostname": hostname, "zone_id": default_zone, "max_ips": MAX_IPS_PER_RECORD, "ttl": DEFAULT_RECORD_TTL}]
+
+    def get_state_store(self):
+        """The SYNC_STATE KV binding, or the in-isolate stand-in when the binding is not configured."""
+        store = getattr(self.env, "SYNC_STATE", None)
+        return _LOCAL_STATE if store is None else store
+
+    async def kv_get_json(self, key):
+        try:
+            raw = await self.get_state_store().get(key)
+            return json.loads(raw) if raw else None
+        except Exception as e:
+            print(f"[WARN] [STATE_STORE] Read of {key} failed: {str(e)}")
+            return None
+
+    async def kv_put_json(self, key, value):
+        try:
+            await self.get_state_store().put(key, json.dumps(value, separators=(",", ":")))
+        except Exception as e:
+            print(f"[WARN] [STATE_STORE] Write of {key} failed: {str(e)}")
+
+    async def log(self, level: str, module: str, message: str, sink=None, **fields):
+        """Emits a structured log record to stdout and, when given, to a sink.
+
+        Extra keyword fields (phase, type, line, duration_ms, ...) travel with the record and show
+        up in NDJSON output. Records below LOG_LEVEL skip stdout; sinks apply their own level.
+        """
+        to_stdout = level_value(level) >= level_value(self.get_env_var("LOG_LEVEL", "INFO"))
+        if not to_stdout and sink is None:
+            return
+        record = make_record(level, module, message, **fields)
+        if to_stdout:
+            print(format_text(record)) # Standard stdout for CF dashboard
+        if sink is not None:
+            await sink.emit(record)
+
+    def open_log_sink(self, writer, encoder, fmt="text", level=None):
+        """A buffered LogSink over a stream writer, flushed per LOG_FLUSH_* env.
+
+        `level` is the caller's own (the /api/sync body's "level") and defaults to INFO. LOG_LEVEL
+        only filters stdout, so a quiet dashboard never empties the stream a client asked for.
+        """
+        return LogSink(
+            writer, encoder,
+            level=level or "INFO",
+            fmt=fmt,
+            flush_bytes=self.get_env_int("LOG_FLUSH_BYTES", DEFAULT_FLUSH_BYTES),
+            flush_ms=self.get_env_int("LOG_FLUSH_MS", DEFAULT_FLUSH_MS),
+        )
+
+    async def enter_phase(self, sink, phase):
+        if METRICS.active is not None:
+            METRICS.active.enter(phase)
+        if isinstance(sink, SyncBroadcast):
+            await sink.enter_phase(phase)
+
+    async def stream_run(self, trigger, sink, dry_run=False, force=False):
+        """Starts (or joins) a run and pumps its log stream into `sink` until the run closes."""
+        try:
+            run, started = self.coordinate_sync(trigger, dry_run=dry_run, force=force)
+            if run is _ACTIVE_SYNC["next"]:
+                await self.log("INFO", "INIT", f"A {_ACTIVE_SYNC['run'].mode} run is in progress without the requested options. Queued a follow-up {run.mode} run behind it.", sink)
+            elif not started:
+                await self.log("INFO", "INIT", f"A {run.mode} run is already in progress ({int(time.time() - run.started_at)}s). Attaching to its log stream.", sink)
+            await run.attach(sink)
+        except Exception:
+            await self.log("FATAL", "EXECUTION", traceback.format_exc(), sink)
+            await sink.close()
+
+    def coordinate_sync(self, trigger, dry_run=False, force=False):
+        """Single-flight entry point for every sync trigger in this isolate.
+
+        Returns (run, started). While a run is in progress, a trigger it covers (see `covers`: a
+        dry run during a real run, an unforced trigger during a forced one, the same options, but
+        never CRON during a run that may reuse cached upstream data) gets that run back instead of
+        starting another. Any other trigger gets the single follow-up run queued behind it, widened
+        to cover every such trigger; it starts once the current run finishes. Callers attach to the
+        returned run's log stream either way.
+        """
+        run = _ACTIVE_SYNC["run"]
+        if run is not None and not run.closed:
+            if run.covers(trigger, dry_run, force):
+                return run, False
+            queued = _ACTIVE_SYNC["next"]
+            if queued is None:
+                queued = _ACTIVE_SYNC["next"] = SyncBroadcast(trigger, dry_run, force)
+            else:
+                queued.merge(trigger, dry_run, force)
+            return queued, False
+
+        run = SyncBroadcast(trigger, dry_run, force)
+        self.launch_run(run)
+        return run, True
+
+    def launch_run(self, run):
+        """Makes `run` the active run and executes it in the background."""
+        run.started_at = time.time()
+        trace = METRICS.start_run(run.trigger, run.mode)
+
+        async def execute():
+            outcome = "error"
+            try:
+                await self.log("INFO", "INIT", f"Background {run.mode} sequence triggered via {run.trigger}.", run)
+                outcome = await self.perform_full_sync(run, dry_run=run.dry_run, force=run.force, prefer_cached=run.prefers_cached)
+            except Exception:
+                await self.log("FATAL", "EXECUTION", traceback.format_exc(), run)
+            finally:
+                METRICS.finish_run(trace, outcome)
+                await self.log("INFO", "METRICS", f"Run finished ({outcome}) in {trace.duration_ms} ms: {trace.summary() or 'no phases'}; {len(trace.fetches)} outbound call(s).", run, duration_ms=trace.duration_ms, outcome=outcome)
+                if _ACTIVE_SYNC["run"] is run:
+                    queued, _ACTIVE_SYNC["next"] = _ACTIVE_SYNC["next"], None
+                    _ACTIVE_SYNC["run"] = None
+                    if queued is not None:
+                        self.launch_run(queued)
+                await run.close()
+
+        _ACTIVE_SYNC["run"] = run
+        run.task = self.run_in_background(execute())
+
+    # ===========================================================
+    # CORE DNS SYNCHRONIZATION ENGINE (HUAWEI CLOUD)
+    # ===========================================================
+    def model_targets(self, v4_info, v6_info, line_map, book, incumbents, now, probes=None, max_ips=MAX_IPS_PER_RECORD):
+        """Scores the upstream candidates and picks each record's IPs with hysteresis.
+
+        `default_view` draws from the CN list, or from every carrier's list when CN is absent.
+        Candidates that failed a reachability probe are dropped or demoted (PROBE_MODE). Returns ({"A": {line: ips}, "AAAA": {...}}, [(type, line) held steady by the margin]).
+        """
+        margin = self.get_env_int("SELECTION_MARGIN_PCT", DEFAULT_MARGIN_PCT)
+        probe_mode = self.get_env_var("PROBE_MODE", "drop")
+        targets = {"A": {}, "AAAA": {}}
+        held = []
+        for rtype, family, info in (("A", "v4", v4_info), ("AAAA", "v6", v6_info)):
+            if not info:
+                continue
+            lines = [("default_view", "CN", info.get("CN") or [item for code in ("CM", "CU", "CT") for item in info.get(code) or []])]
+            lines += [(hw_line, net_code, info.get(net_code)) for net_code, hw_line in line_map.items()]
+            for line, key, items in lines:
+                scores = book.observe(f"{family}:{key}", candidate_scores(items), now)
+                if probes:
+                    scores = apply_probes(scores, probes, probe_mode)
+                if not scores:
+                    continue
+                selected, steady = select_ips(scores, incumbents.get(rtype, {}).get(line), max_ips, margin)
+                targets[rtype][line] = selected
+                if steady:
+                    held.append((rtype, line))
+        return targets, held
+
+    async def probe_candidates(self, v4_info, v6_info, sink=None):
+        """Optional probe stage (PROBE_CANDIDATES=1): {ip: handshake ms or None}, {} when off or unusable.
+
+        Probes are plain TCP connects; PROBE_TLS=1 adds a TLS handshake, which only passes on edges
+        whose certificate covers the bare IP (see probe.py).
+        """
+        if self.get_env_var("PROBE_CANDIDATES") not in ("1", "true"):
+            return {}
+        ips = list(dict.fromkeys(str(item.get("ip") or "").strip() for info in (v4_info, v6_info) if info for items in info.values() for item in items or []))
+        ips = [ip for ip in ips if ip]
+        if not ips:
+            return {}
+
+        await self.enter_phase(sink, "probe")
+        try:
+            connect = runtime_connect()
+        except Exception as e:
+            await self.log("WARN", "PROBE", f"Sockets API unavailable, publishing unprobed candidates: {str(e)}", sink)
+            return {}
+
+        probes = await probe_ips(
+            ips, connect,
+            tls=self.get_env_var("PROBE_TLS", "0") in ("1", "true"),
+            budget_ms=self.get_env_int("PROBE_BUDGET_MS", DEFAULT_PROBE_BUDGET_MS),
+            timeout_ms=self.get_env_int("PROBE_TIMEOUT_MS", DEFAULT_PROBE_TIMEOUT_MS),
+            concurrency=self.get_env_int("PROBE_CONCURRENCY", DEFAULT_PROBE_CONCURRENCY),
+        )
+        passed = sorted(ms for ms in probes.values() if ms is not None)
+        failed = [ip for ip, ms in probes.items() if ms is None]
+        METRICS.inc("probes_total", len(passed), result="ok")
+        METRICS.inc("probes_total", len(failed), result="failed")
+        METRICS.inc("probes_total", len(ips) - len(probes), result="skipped")
+        for ip, ms in probes.items():
+            await self.log("DEBUG", "PROBE", f"{ip} {'unreachable' if ms is None else f'handshake {ms} ms'}.", sink, ip=ip, duration_ms=ms)
+
+        if probes and not passed:
+            # Indistinguishable from the runtime refusing the connection, so do not trust it.
+            await self.log("WARN", "PROBE", f"All {len(probes)} probe(s) failed. Treating probing as unavailable and publishing unprobed candidates.", sink)
+            return {}
+        median = f"{passed[len(passed) // 2]} ms" if passed else "n/a"
+        await self.log("INFO" if not failed else "WARN", "PROBE", f"Probed {len(probes)}/{len(ips)} candidate(s): {len(passed)} reachable, {len(failed)} unreachable; median handshake {median}.", sink)
+        return probes
+
+    async def perform_full_sync(self, sink=None, dry_run=False, force=False, prefer_cached=False):
+        """Reconciles the HW recordsets of every sync target with the upstream picks.
+
+        Upstream payloads, topology and probes are fetched once and shared; with several targets
+        they are reconciled concurrently, with every HW call of the run under HW_MAX_INFLIGHT.
+        Returns the run outcome (halted, skipped, dry_run, noop, failed or applied; the most
+        severe one across targets). With `prefer_cached`, upstream payloads fetched within
+        UPSTREAM_FRESH_SECONDS are reused instead of refetched."""
+        targets = self.get_sync_targets()
+        hw = self.get_hw_client()
+        self.hw_limiter = asyncio.Semaphore(max(1, self.get_env_int("HW_MAX_INFLIGHT", DEFAULT_HW_MAX_INFLIGHT)))
+
+        # Upstream payloads and routing topology are independent, so fetch them side by side.
+        await self.enter_phase(sink, "upstream")
+        await self.log("INFO", "UPSTREAM", "Fetching optimal IPs from provider and HW system routing topology...", sink)
+        v4_info, v6_info, line_map = await asyncio.gather(
+            self.get_upstream_ips("v4", prefer_cached, sink),
+            self.get_upstream_ips("v6", prefer_cached, sink),
+            self.resolve_line_map(hw, sink),
+        )
+        if not v4_info and not v6_info:
+            await self.log("ERROR", "UPSTREAM", "Upstream payload empty. Halting operation.", sink)
+            return "halted"
+
+        probes = await self.probe_candidates(v4_info, v6_info, sink)
+        shared = (v4_info, v6_info, line_map, probes)
+
+        if len(targets) == 1:
+            outcome = await self.sync_target(hw.for_zone(targets[0]["zone_id"]), targets[0], shared, sink, dry_run, force, phased=True)
+            METRICS.inc("target_runs_total", target=targets[0]["hostname"], outcome=outcome)
+            return outcome
+
+        await self.enter_phase(sink, "reconcile")
+        await self.log("INFO", "TARGETS", f"Reconciling {len(targets)} targets concurrently ({', '.join(t['hostname'] for t in targets)}).", sink)
+
+        async def run_target(target):
+            LOG_CONTEXT.set({"target": target["hostname"]})
+            try:
+                return await self.sync_target(hw.for_zone(target["zone_id"]), target, shared, sink, dry_run, force)
+            except Exception as e:
+                await self.log("ERROR", "EXECUTION", f"Target raised: {str(e)}", sink)
+                return "failed"
+
+        outcomes = await asyncio.gather(*(run_target(target) for target in targets))
+        for target, outcome in zip(targets, outcomes):
+            METRICS.inc("target_runs_total", target=target["hostname"], outcome=outcome)
+        summary = ", ".join(f"{target['hostname']} {outcome}" for target, outcome in zip(targets, outcomes))
+        await self.log("INFO" if all(o in ("applied", "noop", "skipped", "dry_run") for o in outcomes) else "ERROR", "TARGETS", f"Per-target results ({summary}).", sink,
+                       results={target["hostname"]: outcome for target, outcome in zip(targets, outcomes)})
+        return min(outcomes, key=OUTCOME_SEVERITY.index)
+
+    async def sync_target(self, hw, target, shared, sink=None, dry_run=False, force=False, phased=False):
+        """Models, plans and applies one target against its zone; returns the target's outcome.
+
+        `shared` is the (v4_info, v6_info, line_map, probes) tuple fetched once per run. Only a
+        lone target drives the run's phase markers.
+        """
+        v4_info, v6_info, line_map, probes = shared
+        full_hostname, ttl, max_ips = target["hostname"], target["ttl"], target["max_ips"]
+
+        async def phase(name):
+            if phased:
+                await self.enter_phase(sink, name)
+
+        await phase("model")
+        await self.log("INFO", "STATE", "Modeling target DNS record definitions.", sink)
+        now = time.time()
+        state_key = f"applied:{full_hostname}"
+        scores_key = f"scores:{full_hostname}"
+        applied, history = await asyncio.gather(self.kv_get_json(state_key), self.kv_get_json(scores_key))
+        book = ScoreBook(history, self.get_env_int("SCORE_EWMA_ALPHA_PCT", DEFAULT_EWMA_ALPHA_PCT))
+        desired, held = self.model_targets(v4_info, v6_info, line_map, book, (applied or {}).get("targets") or {}, now, probes, max_ips)
+        if held:
+            METRICS.inc("selection_changes_avoided_total", len(held))
+            await self.log("INFO", "STATE", f"Hysteresis kept {len(held)} record(s) unchanged despite upstream reordering: {', '.join(f'{t} ({l})' for t, l in held)}.", sink, avoided=len(held))
+        if not dry_run:
+            book.prune(now)
+            await self.kv_put_json(scores_key, book.history)
+
+        fingerprint = fingerprint_targets(full_hostname, desired, ttl)
+        if not (force or dry_run):
+            if applied and applied.get("fingerprint") == fingerprint:
+                age = now - applied.get("applied_at", 0)
+                if age < self.get_env_int("SYNC_MAX_STALENESS", DEFAULT_SYNC_MAX_STALENESS):
+                    await self.log("INFO", "SUCCESS", f"Upstream target unchanged since last applied state ({int(age)}s ago, {fingerprint[:12]}). Skipping reconciliation.", sink)
+                    METRICS.inc("noop_skips_total", reason="fingerprint")
+                    return "skipped"
+                await self.log("INFO", "STATE", f"Applied state is {int(age)}s old. Re-verifying remote state.", sink)
+
+        await phase("remote")
+        await self.log("INFO", "HW_API", "Querying authoritative remote state.", sink)
+        existing_records = await self.get_hw_recordsets(hw, full_hostname, sink)
+        if existing_records is None:
+            # Reconciling against a partial listing would duplicate or miss records.
+            await self.log("ERROR", "HW_API", "Authoritative state unavailable. Halting operation.", sink)
+            return "halted"
+
+        plan = plan_reconciliation(existing_records, desired, ttl)
+        pending = [step for step in plan if step["action"] != "noop"]
+        await phase("plan")
+        await self.log("INFO", "PLAN", f"Reconciliation plan: {describe_plan(plan)}.", sink)
+        for step in plan:
+            await self.log("INFO" if dry_run else "DEBUG", "DRY_RUN" if dry_run else "PLAN", format_plan_step(step), sink, action=step["action"], type=step["type"], line=step["line"])
+
+        if dry_run:
+            await self.log("INFO", "SUCCESS", f"Dry run complete. {len(pending)} write operation(s) would be executed.", sink)
+            return "dry_run"
+        if not pending:
+            await self.kv_put_json(state_key, {"fingerprint": fingerprint, "applied_at": time.time(), "targets": desired})
+            await self.log("INFO", "SUCCESS", "Remote state already matches target. No write operations required.", sink)
+            METRICS.inc("noop_skips_total", reason="remote_match")
+            return "noop"
+
+        operations = []
+        batches = {"update": [], "delete": []}
+        use_batches = self.get_env_var("HW_BATCH_WRITES", "1") not in ("0", "false")
+        for step in pending:
+            rtype, line = step["type"], step["line"]
+            if use_batches and step["action"] in batches:
+                batches[step["action"]].append(step)
+            elif step["action"] == "update":
+                operations.append((f"UPDATE {rtype} ({line})", "WARN", "STATE", f"Desynchronization detected on {rtype} ({line}). Commencing update.",
+                                   partial(self.update_hw_record, hw, step["id"], full_hostname, step["records"], rtype, ttl), {"type": rtype, "line": line}))
+            elif step["action"] == "delete":
+                operations.append((f"DELETE {rtype} ({line})", "WARN", "GARBAGE", f"Orphaned record {rtype} ({line}) isolated. Purging.",
+                                   partial(self.delete_hw_record, hw, step["id"]), {"type": rtype, "line": line}))
+            elif step["action"] == "create":
+                operations.append((f"CREATE {rtype} ({line})", "INFO", "STATE", f"Provisioning missing record {rtype} ({line}).",
+                                   partial(self.create_hw_record, hw, full_hostname, rtype, step["records"], line, ttl), {"type": rtype, "line": line}))
+
+        batch_size = max(1, self.get_env_int("HW_BATCH_SIZE", DEFAULT_HW_BATCH_SIZE))
+        for kind, steps in batches.items():
+            for i in range(0, len(steps), batch_size):
+                chunk = steps[i:i + batch_size]
+                labels = ", ".join(f"{step['type']} ({step['line']})" for step in chunk)
+                level, module, verb = ("WARN", "STATE", "Updating desynchronized") if kind == "update" else ("WARN", "GARBAGE", "Purging orphaned")
+                operations.append((f"BATCH {kind.upper()} x{len(chunk)}", level, module, f"{verb} records in one batch: {labels}.",
+                                   partial(self.apply_hw_batch, kind, hw, full_hostname, chunk, ttl), {"count": len(chunk)}))
+
+        await phase("write")
+        results = await self.execute_operations(operations, sink)
+        failed = [r for r in results if not r["ok"]]
+        if failed:
+            await self.log("ERROR", "STATE", f"Write phase finished with {len(failed)}/{len(results)} failed operation(s): {', '.join(r['label'] for r in failed)}.", sink)
+            return "failed"
+
+        await self.kv_put_json(state_key, {"fingerprint": fingerprint, "applied_at": time.time(), "targets": desired})
+        await self.log("INFO", "SUCCESS", "System infrastructure strictly synchronized.", sink)
+        return "applied"
+
+    async def execute_operations(self, operations, sink=None):
+        """Dispatches independent record operations concurrently under the SYNC_CONCURRENCY limit.
+
+        Each operation is a (label, level, module, message, action, fields) tuple where action is a
+        partial awaiting a trailing sink argument and fields are attached to its log records. Records
+        emitted by an operation are held back and flushed as one contiguous group once it settles, so
+        the stream stays readable; the group ends with the operation's outcome and duration.
+        """
+        limit = max(1, self.get_env_int("SYNC_CONCURRENCY", DEFAULT_SYNC_CONCURRENCY))
+        semaphore = asyncio.Semaphore(limit)
+        flush_lock = asyncio.Lock()
+
+        async def run(label, level, module, message, action, fields):
+            async with semaphore:
+                group = LogGroup() if sink else None
+                started = time.perf_counter()
+                error = None
+                try:
+                    await self.log(level, module, message, group, **fields)
+                    ok = await action(group)
+                except Exception as e:
+                    ok, error = False, str(e)
+                    await self.log("ERROR", "EXECUTION", f"{label} raised: {error}", group, **fields)
+                elapsed_ms = int((time.perf_counter() - started) * 1000)
+                METRICS.inc("write_operations_total", ok=str(bool(ok)).lower())
+                await self.log("DEBUG", "EXECUTION", f"{label} {'completed' if ok else 'failed'} in {elapsed_ms} ms.", group, duration_ms=elapsed_ms, ok=bool(ok), **fields)
+                if group:
+                    async with flush_lock:
+                        await group.flush(sink)
+                return {"label": label, "ok": bool(ok), "error": error, "elapsed_ms": elapsed_ms}
+
+        if operations:
+            await self.log("INFO", "EXECUTION", f"Dispatching {len(operations)} record operation(s) with concurrency {limit}.", sink)
+        return list(await asyncio.gather(*(run(*op) for op in operations)))
+
+    # -----------------------------------------------------------
+    # UPSTREAM & HW CLOUD API METHODS
+    # -----------------------------------------------------------
+    async def fetch_text(self, url, options=None, timeout_ms=DEFAULT_UPSTREAM_TIMEOUT_MS, retries=0, hedge_after_ms=0):
+        """Fetches `url` and returns (status, body text) under a per-attempt AbortSignal timeout.
+
+        With `hedge_after_ms` set, a second identical request is raced against the first once it
+        has been outstanding that long and whichever settles successfully first wins. Exceptions and
+        retryable statuses are retried up to `retries` times with full-jitter exponential backoff.
+        Every attempt is recorded in METRICS with its latency, status and response size.
+        """
+        host = urlparse(url).hostname or ""
+        method = (options or {}).get("method", "GET")
+
+        async def attempt():
+            init = dict(options or {})
+            init["signal"] = js.AbortSignal.timeout(timeout_ms)
+            started = time.perf_counter()
+            try:
+                resp = await js.fetch(url, to_js(init, dict_converter=js.Object.fromEntries))
+                text = await resp.text()
+            except Exception:
+                METRICS.record_fetch(host, method, "error", 0, round((time.perf_counter() - started) * 1000, 1))
+                raise
+            METRICS.record_fetch(host, method, resp.status, len(text.encode("utf-8")), round((time.perf_counter() - started) * 1000, 1))
+            return resp.status, text
+
+        async def hedged():
+            if hedge_after_ms <= 0:
+                return await attempt()
+            first = asyncio.ensure_future(attempt())
+            done, _ = await asyncio.wait({first}, timeout=hedge_after_ms / 1000)
+            if done:
+                return first.result()
+            pending = {first, asyncio.ensure_future(attempt())}
+            last_error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        for loser in pending:
+                            loser.cancel()
+                        return task.result()
+                    last_error = task.exception()
+            raise last_error
+
+        for attempt_no in range(retries + 1):
+            try:
+                status, text = await hedged()
+                if status not in RETRYABLE_STATUSES or attempt_no == retries:
+                    return status, text
+            except Exception:
+                if attempt_no == retries:
+                    raise
+            await asyncio.sleep(random.uniform(0, RETRY_BACKOFF_BASE_MS * (2 ** attempt_no)) / 1000)
+
+    async def hw_fetch(self, hw, method, path, query="", body=None):
+        """One signed HW API call through fetch_text (HW_TIMEOUT_MS, no retries); returns (status, text).
+
+        During a sync run, calls queue on the run's shared HW_MAX_INFLIGHT limiter.
+        """
+        async with self.hw_limiter or contextlib.nullcontext():
+            # Sign only once a slot is free so the X-Sdk-Date is current.
+            return await self.fetch_text(hw.url(path, query), hw.request_init(method, path, query, body), timeout_ms=self.get_env_int("HW_TIMEOUT_MS", DEFAULT_HW_TIMEOUT_MS))
+
+    async def get_upstream_ips(self, ip_type, prefer_cached=False, sink=None):
+        """The upstream `info` payload for `ip_type`, backed by the last good copy in KV.
+
+        A fresh copy (UPSTREAM_FRESH_SECONDS) is reused when `prefer_cached` is set. When the fetch
+        fails, a copy no older than UPSTREAM_MAX_STALENESS seconds is served instead.
+        """
+        key = f"upstream:{ip_type}"
+        cached = await self.kv_get_json(key)
+        age = time.time() - cached.get("fetched_at", 0) if cached and cached.get("info") else None
+        if prefer_cached and age is not None and age <= self.get_env_int("UPSTREAM_FRESH_SECONDS", DEFAULT_UPSTREAM_FRESH_SECONDS):
+            METRICS.inc("upstream_cache_total", family=ip_type, result="fresh_hit")
+            await self.log("INFO", "UPSTREAM", f"Reusing {ip_type} payload fetched {int(age)}s ago.", sink, family=ip_type, age_s=int(age))
+            return cached["info"]
+
+        info = await self.get_wetest_ips(ip_type, sink)
+        if info:
+            METRICS.inc("upstream_cache_total", family=ip_type, result="fetched")
+            await self.kv_put_json(key, {"info": info, "fetched_at": time.time()})
+            return info
+        if age is not None and age <= self.get_env_int("UPSTREAM_MAX_STALENESS", DEFAULT_UPSTREAM_MAX_STALENESS):
+            METRICS.inc("upstream_cache_total", family=ip_type, result="stale_fallback")
+            await self.log("WARN", "UPSTREAM", f"Falling back to last good {ip_type} payload from {int(age)}s ago.", sink, family=ip_type, age_s=int(age))
+            return cached["info"]
+        METRICS.inc("upstream_cache_total", family=ip_type, result="unavailable")
+        if age is not None:
+            await self.log("WARN", "UPSTREAM", f"Last good {ip_type} payload is {int(age)}s old, past UPSTREAM_MAX_STALENESS. Not using it.", sink, family=ip_type, age_s=int(age))
+        return None
+
+    async def get_wetest_ips(self, ip_type, sink=None):
+        url = f"https://www.wetest.vip/api/cf2dns/get_cloudflare_ip?key={self.get_env_var('OPTIMIZE_KEY', 'o1zrmHAF')}&type={ip_type}"
+        try:
+            _, text = await self.fetch_text(
+                url,
+                timeout_ms=self.get_env_int("UPSTREAM_TIMEOUT_MS", DEFAULT_UPSTREAM_TIMEOUT_MS),
+                retries=self.get_env_int("UPSTREAM_RETRIES", DEFAULT_UPSTREAM_RETRIES),
+                hedge_after_ms=self.get_env_int("UPSTREAM_HEDGE_MS", 0),
+            )
+            data = json.loads(text)
+            if data.get("status") and data.get("code") == 200:
+                return data.get("info")
+            else:
+                await self.log("WARN", "UPSTREAM", f"Extraction failed for {ip_type}: {data.get('msg')}", sink)
+                return None
+        except Exception as e:
+            await self.log("ERROR", "UPSTREAM", f"Fetch exception on {ip_type}: {str(e)}", sink)
+            return None
+
+    async def resolve_line_map(self, hw, sink=None):
+        """Returns the carrier -> HW line id map, preferring the isolate and persistent caches.
+
+        Entries older than TOPOLOGY_TTL seconds are still served, with a refresh scheduled in the
+        background (stale-while-revalidate). Only a cold miss on both tiers waits for the download.
+        """
+        entry = _TOPOLOGY_CACHE.get(hw.host)
+        if entry is None:
+            entry = await self.kv_get_json(f"topology:{hw.host}")
+            if entry and entry.get("line_map"):
+                _TOPOLOGY_CACHE[hw.host] = entry
+            else:
+                entry = None
+
+        if entry is None:
+            await self.log("INFO", "TOPOLOGY", "Topology cache cold. Compiling HW system routing topology.", sink)
+            return await self.refresh_line_map(hw, sink)
+
+        age = time.time() - entry.get("fetched_at", 0)
+        if age > self.get_env_int("TOPOLOGY_TTL", DEFAULT_TOPOLOGY_TTL) and hw.host not in _TOPOLOGY_REFRESHING:
+            await self.log("INFO", "TOPOLOGY", f"Topology cache stale ({int(age)}s). Serving cached map, revalidating in background.", sink)
+            _TOPOLOGY_REFRESHING.add(hw.host)
+            self.run_in_background(self.refresh_line_map(hw))
+        return dict(entry["line_map"])
+
+    async def refresh_line_map(self, hw, sink=None):
+        try:
+            system_lines = await self.get_system_lines(hw, sink)
+            line_map = build_line_map(system_lines)
+            # A failed download resolves to the static fallbacks only; never persist that.
+            if system_lines:
+                entry = {"line_map": line_map, "fetched_at": time.time()}
+                _TOPOLOGY_CACHE[hw.host] = entry
+                await self.kv_put_json(f"topology:{hw.host}", entry)
+            return line_map
+        finally:
+            _TOPOLOGY_REFRESHING.discard(hw.host)
+
+    async def get_system_lines(self, hw, sink=None):
+        path = "/v2.1/system-lines"
+        try:
+            _, text = await self.fetch_text(
+                hw.url(path), hw.request_init("GET", path),
+                timeout_ms=self.get_env_int("HW_TIMEOUT_MS", DEFAULT_HW_TIMEOUT_MS),
+                retries=self.get_env_int("UPSTREAM_RETRIES", DEFAULT_UPSTREAM_RETRIES),
+            )
+            data = json.loads(text)
+            return data.get('lines', [])
+        except Exception as e:
+            await self.log("ERROR", "HW_API", f"System topology query aborted: {str(e)}", sink)
+            return []
+
+    async def iter_hw_recordsets(self, hw, hostname, page_size=None):
+        """Async iterator over the A/AAAA recordsets named `hostname`, walking every listing page.
+
+        Pages are requested with limit/offset (HW_PAGE_SIZE, at most 500) and the next page is
+        already in flight while the current one is filtered, so only matching records are kept.
+        """
+        page_size = min(max(page_size or self.get_env_int("HW_PAGE_SIZE", DEFAULT_HW_PAGE_SIZE), 1), 500)
+
+        async def fetch_page(offset):
+            status, text = await self.hw_fetch(hw, "GET", hw.recordsets_path, f"name={hostname}&search_mode=equal&limit={page_size}&offset={offset}")
+            if not 200 <= status < 300:
+                raise RuntimeError(f"HTTP {status} at offset {offset}")
+            return json.loads(text)
+
+        offset = 0
+        pending = asyncio.ensure_future(fetch_page(offset))
+        try:
+            while pending is not None:
+                data_py = await pending
+                page = data_py.get('recordsets') or []
+                total = (data_py.get('metadata') or {}).get('total_count')
+                offset += len(page)
+                more = len(page) == page_size and (total is None or offset < total)
+                pending = asyncio.ensure_future(fetch_page(offset)) if more else None
+                for r in page:
+                    rtype = r.get('type')
+                    if rtype not in ('A', 'AAAA') or r.get('name', hostname) != hostname:
+                        continue
+                    line_val = r.get('line')
+                    if not line_val or line_val == 'None':
+                        line_val = 'default_view'
+                    yield {"id": r.get('id'), "line": line_val, "type": rtype, "records": r.get('records', []), "ttl": r.get('ttl')}
+        finally:
+            if pending is not None and not pending.done():
+                pending.cancel()
+
+    async def get_hw_recordsets(self, hw, hostname, sink=None):
+        """Collects every A/AAAA recordset for `hostname`; None if any page could not be read."""
+        try:
+            return [rec async for rec in self.iter_hw_recordsets(hw, hostname)]
+        except Exception as e:
+            await self.log("ERROR", "HW_API", f"Authority record retrieval failed: {str(e)}", sink)
+            return None
+
+    async def delete_hw_record(self, hw, record_id, sink=None):
+        try:
+            status, _ = await self.hw_fetch(hw, "DELETE", f"{hw.recordsets_path}/{record_id}")
+            if not 200 <= status < 300:
+                await self.log("ERROR", "HW_API", f"Deletion rejected: HTTP {status}", sink)
+            return 200 <= status < 300
+        except Exception as e:
+            await self.log("ERROR", "HW_API", f"Exception during deletion: {str(e)}", sink)
+            return False
+
+    async def create_hw_record(self, hw, name, record_type, ips, line, ttl, sink=None):
+        body = json.dumps({"name": name, "type": record_type, "records": ips, "line": line, "ttl": ttl})
+        try:
+            status, text = await self.hw_fetch(hw, "POST", hw.recordsets_path, body=body)
+            if not 200 <= status < 300:
+                await self.log("ERROR", "HW_API", f"Provisioning rejected: {text}", sink)
+            return 200 <= status < 300
+        except Exception as e:
+            await self.log("ERROR", "HW_API", f"Exception during provisioning: {str(e)}", sink)
+            return False
+
+    async def update_hw_record(self, hw, record_id, hostname, ips, record_type, ttl, sink=None):
+        body = json.dumps({"name": hostname, "type": record_type, "records": ips, "ttl": ttl})
+        try:
+            status, text = await self.hw_fetch(hw, "PUT", f"{hw.recordsets_path}/{record_id}", body=body)
+            if not 200 <= status < 300:
+                await self.log("ERROR", "HW_API", f"Update rejected: {text}", sink)
+            return 200 <= status < 300
+        except Exception as e:
+            await self.log("ERROR", "HW_API", f"Exception during update: {str(e)}", sink)
+            return False
+
+    async def apply_hw_batch(self, kind, hw, hostname, steps, ttl, sink=None):
+        """Applies planned update/delete steps through the HW batch API.
+
+        Steps the batch call does not confirm, including all of them if the call is rejected
+        outright, are retried one by one through the single-record endpoints.
+        """
+        if kind == "update":
+            method = "PUT"
+            body = json.dumps({"recordsets": [{"id": step["id"], "name": hostname, "type": step["type"], "records": step["records"], "ttl": ttl} for step in steps]})
+        else:
+            method = "DELETE"
+            body = json.dumps({"recordset_ids": [step["id"] for step in steps]})
+
+        rejected = steps
+        try:
+            status, text = await self.hw_fetch(hw, method, hw.recordsets_path, body=body)
+            if 200 <= status < 300:
+                confirmed = json.loads(text).get("recordsets") if text else None
+                if confirmed is None:
+                    rejected = []
+                else:
+                    confirmed_ids = {r.get("id") for r in confirmed}
+                    rejected = [step for step in steps if step["id"] not in confirmed_ids]
+            else:
+                await self.log("WARN", "HW_API", f"Batch {kind} rejected: HTTP {status} {text[:200]}", sink)
+        except Exception as e:
+            await self.log("WARN", "HW_API", f"Exception during batch {kind}: {str(e)}", sink)
+
+        if not rejected:
+            return True
+        await self.log("WARN", "HW_API", f"Falling back to single calls for {len(rejected)}/{len(steps)} batch {kind} operation(s).", sink)
+        ok = True
+        for step in rejected:
+            if kind == "update":
+                ok = await self.update_hw_record(hw, step["id"], hostname, step["records"], step["type"], ttl, sink) and ok
+            else:
+                ok = await self.delete_hw_record(hw, step["id"], sink) and ok
+        return ok